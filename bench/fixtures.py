@@ -0,0 +1,124 @@
+"""Synthetic transfer history shared by the benchmark stand-ins.
+
+Rows are kept column-wise in arrays so a million of them fit in a few tens
+of megabytes; addresses and hashes are derived from the row index when a
+row is rendered.
+"""
+import bisect
+import math
+import random
+import time
+from array import array
+
+TOKEN_ADDRESS = '0xd44257dde89ca53f1471582f718632e690e46dc2'
+DEAD_ADDRESS = '0x000000000000000000000000000000000000dead'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+BURN_KINDS = {DEAD_ADDRESS: 0, ZERO_ADDRESS: 1}
+OTHER = 2
+TRANSFER_SELECTOR = '0xa9059cbb'
+
+
+def _address(seed):
+    return '0x%040x' % (seed * 0x9E3779B97F4A7C15 % (1 << 160))
+
+
+class TransferHistory:
+    """`rows` direct `transfer()` calls to the token over the last `days` days.
+
+    `burn_ratio` of them send to the dead or zero address. Block numbers map
+    linearly to time, ending at the current time.
+    """
+
+    def __init__(self, rows=10000, days=30, burn_ratio=0.5, block_time=0.25, first_block=100_000_000, seed=1,
+                 token=TOKEN_ADDRESS):
+        rng = random.Random(seed)
+        self.token = token
+        self.block_time = block_time
+        self.first_block = first_block
+        self.head_timestamp = int(time.time())
+        self.head = first_block + int(days * 86400 / block_time)
+
+        self.blocks = array('q', sorted(rng.randint(first_block, self.head) for _ in range(rows)))
+        self.kinds = array('b')
+        self.values = array('q')
+        for _ in range(rows):
+            if rng.random() < burn_ratio:
+                self.kinds.append(0 if rng.random() < 0.8 else 1)
+            else:
+                self.kinds.append(OTHER)
+            self.values.append(rng.randint(1, 10 ** 6))
+        # row indices and blocks of the transfers into each burn address, for tokentx
+        self.burn_rows = {kind: array('q') for kind in BURN_KINDS.values()}
+        for i, kind in enumerate(self.kinds):
+            if kind != OTHER:
+                self.burn_rows[kind].append(i)
+        self.burn_blocks = {kind: array('q', (self.blocks[i] for i in rows_))
+                            for kind, rows_ in self.burn_rows.items()}
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def timestamp(self, block):
+        return int(self.head_timestamp - (self.head - block) * self.block_time)
+
+    def block_at(self, timestamp, closest='before'):
+        block = self.head - (self.head_timestamp - int(timestamp)) / self.block_time
+        block = math.floor(block) if closest == 'before' else math.ceil(block)
+        return max(self.first_block, min(self.head, block))
+
+    def recipient(self, i):
+        kind = self.kinds[i]
+        if kind == 0:
+            return DEAD_ADDRESS
+        if kind == 1:
+            return ZERO_ADDRESS
+        return _address(i * 2 + 1)
+
+    def value(self, i):
+        return self.values[i] * 10 ** 18
+
+    def tx_hash(self, i):
+        return '0x%064x' % (i + 1)
+
+    def txlist_row(self, i):
+        block = self.blocks[i]
+        return {
+            'blockNumber': str(block),
+            'timeStamp': str(self.timestamp(block)),
+            'hash': self.tx_hash(i),
+            'from': _address(i * 2 + 2),
+            'to': self.token,
+            'value': '0',
+            'isError': '0',
+            'input': TRANSFER_SELECTOR + self.recipient(i)[2:].rjust(64, '0') + '%064x' % self.value(i),
+        }
+
+    def tokentx_row(self, i):
+        block = self.blocks[i]
+        return {
+            'blockNumber': str(block),
+            'timeStamp': str(self.timestamp(block)),
+            'hash': self.tx_hash(i),
+            'from': _address(i * 2 + 2),
+            'to': self.recipient(i),
+            'value': str(self.value(i)),
+            'contractAddress': self.token,
+            'tokenDecimal': '18',
+        }
+
+    def rows_between(self, start_block, end_block):
+        """Indices of all rows within the blocks."""
+        return range(bisect.bisect_left(self.blocks, start_block), bisect.bisect_right(self.blocks, end_block))
+
+    def burn_rows_between(self, address, start_block, end_block):
+        kind = BURN_KINDS.get(address.lower())
+        if kind is None:
+            return []
+        blocks = self.burn_blocks[kind]
+        lo, hi = bisect.bisect_left(blocks, start_block), bisect.bisect_right(blocks, end_block)
+        return self.burn_rows[kind][lo:hi]
+
+    def burned(self, since=None):
+        """Burned base units, optionally only from `since` (unix time) on."""
+        start = 0 if since is None else bisect.bisect_left(self.blocks, self.block_at(since, 'after'))
+        return sum(self.values[i] for i in range(start, len(self)) if self.kinds[i] != OTHER) * 10 ** 18
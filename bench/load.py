@@ -0,0 +1,292 @@
+"""Synthetic load against the bot's handlers, without Telegram.
+
+    python -m bench.load --updates 5000 --users 3000 --rate 0
+    python -m bench.load --updates 20000 --rate 500 --mix week_statistics=70,burn_last_5=30
+    python -m bench.load --mongo-uri mongodb://127.0.0.1:27017
+
+Builds `Message` and `CallbackQuery` updates from many distinct users and
+hands them to a `Dispatcher` holding `handlers.commands.router` through the
+same `UpdateFeeder` the webhook uses. The bot's `RecordingSession` answers
+API calls locally and still reads uploads; Arbiscan, DexView and the RPC node are
+`bench.standins`. `--rate 0` submits everything at once, as when a large
+channel links the bot.
+
+Reported per update kind: end-to-end latency (submit to handler done,
+including the wait for a free slot) and handler latency; event-loop lag
+sampled every `--lag-interval` seconds; and upstream and Telegram calls per
+update.
+
+Without `--mongo-uri` the weekly statistics snapshot is primed in memory,
+so /week_statistics measures the read path only, which is what it does in
+production between refreshes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import urllib.request
+from collections import Counter, defaultdict
+
+from .suite import _child_env, _start_standins, percentile
+
+BOT_TOKEN = '123456:load-bench'
+DEFAULT_MIX = 'week_statistics=40,lastburns=25,burn_last_5=25,burnLastMonth=10'
+
+
+def _message(update_id, user_id, text):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}],
+        },
+    }
+
+
+def _callback(update_id, user_id, data):
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': True, 'first_name': 'FakeBot'},
+                'text': 'Choose the number of transactions or time range:',
+            },
+        },
+    }
+
+
+UPDATE_KINDS = {
+    'week_statistics': lambda update_id, user_id: _message(update_id, user_id, '/week_statistics'),
+    'lastburns': lambda update_id, user_id: _message(update_id, user_id, '/lastburns'),
+    'burn_last_5': lambda update_id, user_id: _callback(update_id, user_id, 'burn_last_5'),
+    'burn_last_10': lambda update_id, user_id: _callback(update_id, user_id, 'burn_last_10'),
+    'burnLastMonth': lambda update_id, user_id: _callback(update_id, user_id, 'burnLastMonth'),
+}
+
+
+def _parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        kind, _, weight = item.partition('=')
+        if kind not in UPDATE_KINDS:
+            raise ValueError(f"unknown update kind {kind!r}, expected one of {', '.join(UPDATE_KINDS)}")
+        weights[kind] = float(weight or 1)
+    return weights
+
+
+def _kind_of(update):
+    if update.message is not None:
+        return update.message.text.split()[0].lstrip('/')
+    return update.callback_query.data.partition('@')[0]
+
+
+def _prime_snapshot():
+    from utils.snapshots import week_statistics_snapshot
+    from utils.tokens import all_tokens
+    now = time.time()
+    stats = {
+        token.key: {
+            'start': int(now) - 7 * 86400, 'end': int(now),
+            'total_supply': 10 ** 9, 'burned': 4 * 10 ** 8, 'burned_week': 1.5 * 10 ** 6,
+            'current_supply': 6 * 10 ** 8, 'burned_percent': 40.0,
+            'price_usd': 0.0001234, 'liquidity_usd': 250000.0, 'price_source': 'dexview',
+            'daily_burned': {'days': [int(now) - 86400 * day for day in range(7, 0, -1)],
+                             'burned': [2 * 10 ** 5 + 10 ** 4 * day for day in range(7)]},
+        } for token in all_tokens()
+    }
+    week_statistics_snapshot._latest = {'_id': week_statistics_snapshot.name, 'version': 1, 'computed_at': now,
+                                        'data': {'tokens': stats}}
+    week_statistics_snapshot.read_ttl = float('inf')
+    week_statistics_snapshot.stale_after = float('inf')
+
+
+async def _watch_loop_lag(interval, samples, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def _upstream_calls():
+    from utils.metrics import upstream_requests
+    calls = Counter()
+    for (upstream, _, _), value in upstream_requests._values.items():
+        calls[upstream] += value
+    return calls
+
+
+async def run_load(args, stats_url):
+    from aiogram import Bot, Dispatcher
+
+    from handlers.commands import router
+    from utils.fake_session import RecordingSession
+    from utils.http_client import close_http_client
+    from utils.webhook import UpdateFeeder
+
+    if not args.mongo_uri:
+        _prime_snapshot()
+
+    session = RecordingSession(read_uploads=True)
+    bot = Bot(BOT_TOKEN, session=session)
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    feeder = UpdateFeeder(dispatcher, bot, concurrency=args.concurrency, max_pending=args.updates)
+
+    submitted = {}
+    end_to_end = defaultdict(list)
+    handler = defaultdict(list)
+    errors = Counter()
+
+    @dispatcher.update.outer_middleware()
+    async def measure(call_next, update, data):
+        started = time.perf_counter()
+        kind = _kind_of(update)
+        try:
+            return await call_next(update, data)
+        except Exception as e:
+            errors[f"{kind}: {type(e).__name__}: {e}"] += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            handler[kind].append(finished - started)
+            end_to_end[kind].append(finished - submitted.pop(update.update_id))
+
+    rng = random.Random(args.seed)
+    weights = _parse_mix(args.mix)
+    kinds = rng.choices(list(weights), list(weights.values()), k=args.updates)
+    user_ids = [10 ** 9 + rng.randrange(args.users) for _ in range(args.updates)]
+
+    lag = []
+    stop = asyncio.Event()
+    watcher = asyncio.ensure_future(_watch_loop_lag(args.lag_interval, lag, stop))
+    upstream_before = _upstream_calls()
+    standins_before = _read_stats(stats_url)
+
+    started = time.perf_counter()
+    refused = 0
+    for update_id, (kind, user_id) in enumerate(zip(kinds, user_ids), start=1):
+        submitted[update_id] = time.perf_counter()
+        if not feeder.submit(UPDATE_KINDS[kind](update_id, user_id)):
+            submitted.pop(update_id)
+            refused += 1
+        if args.rate:
+            # pace against the schedule so slow iterations do not lower the rate
+            delay = started + update_id / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    while feeder.pending:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await watcher
+    standins_after = _read_stats(stats_url)
+    upstream = _upstream_calls() - upstream_before
+    await close_http_client()
+
+    return {
+        'elapsed': elapsed, 'refused': refused, 'kinds': Counter(kinds),
+        'end_to_end': end_to_end, 'handler': handler, 'lag': lag, 'errors': errors,
+        'telegram': Counter(call[0] for call in session.calls), 'uploaded_bytes': session.uploaded_bytes,
+        'upstream': upstream, 'standins': _stats_delta(standins_before, standins_after),
+    }
+
+
+def _read_stats(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def _stats_delta(before, after):
+    delta = Counter()
+    for service, calls in after.items():
+        for name, count in calls.items():
+            delta[f"{service}.{name}"] = count - before.get(service, {}).get(name, 0)
+    return +delta
+
+
+def _milliseconds(values, q):
+    return percentile(values, q) * 1000 if values else float('nan')
+
+
+def report(result, args):
+    handled = sum(len(values) for values in result['end_to_end'].values())
+    print(f"{handled} updates in {result['elapsed']:.2f}s ({handled / result['elapsed']:.0f}/s), "
+          f"{result['refused']} refused, concurrency {args.concurrency}")
+    print(f"\n{'update':<18}{'count':>7}{'e2e p50':>10}{'e2e p95':>10}{'e2e p99':>10}"
+          f"{'hdl p50':>10}{'hdl p99':>10}  (ms)")
+    for kind in sorted(result['end_to_end']):
+        e2e, handler = result['end_to_end'][kind], result['handler'][kind]
+        print(f"{kind:<18}{len(e2e):>7}{_milliseconds(e2e, 0.5):>10.1f}{_milliseconds(e2e, 0.95):>10.1f}"
+              f"{_milliseconds(e2e, 0.99):>10.1f}{_milliseconds(handler, 0.5):>10.1f}"
+              f"{_milliseconds(handler, 0.99):>10.1f}")
+
+    lag = result['lag']
+    print(f"\nevent-loop lag over {len(lag)} samples: p50 {_milliseconds(lag, 0.5):.1f}ms, "
+          f"p99 {_milliseconds(lag, 0.99):.1f}ms, max {max(lag, default=0) * 1000:.1f}ms")
+
+    per_update = max(handled, 1)
+    print("\ncalls per update:")
+    for name, count in sorted(result['upstream'].items()):
+        print(f"  upstream {name:<30}{count / per_update:>8.3f}  ({count})")
+    for name, count in sorted(result['standins'].items()):
+        print(f"  stand-in {name:<30}{count / per_update:>8.3f}  ({count})")
+    for name, count in sorted(result['telegram'].items()):
+        print(f"  telegram {name:<30}{count / per_update:>8.3f}  ({count})")
+    if result['uploaded_bytes']:
+        print(f"  uploaded {result['uploaded_bytes'] / 1024:.1f} KB")
+
+    if result['errors']:
+        print("\nhandler errors:")
+        for error, count in result['errors'].most_common(10):
+            print(f"  {count:>6}  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=3000, help='distinct chats sending the updates')
+    parser.add_argument('--rate', type=float, default=0, help='updates per second; 0 submits all at once')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"kind=weight list from: {', '.join(UPDATE_KINDS)}")
+    parser.add_argument('--concurrency', type=int, default=50, help='handlers running at once, as WEBHOOK_CONCURRENCY')
+    parser.add_argument('--rows', type=int, default=10000, help='transfers in the stand-in history')
+    parser.add_argument('--latency', type=float, default=0.05, help='added per stand-in response, in seconds')
+    parser.add_argument('--rps', type=float, default=5, help='Arbiscan rate limit used by the code under test')
+    parser.add_argument('--lag-interval', type=float, default=0.01)
+    parser.add_argument('--mongo-uri', default=os.environ.get('BENCH_MONGO_URI'))
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    _parse_mix(args.mix)
+
+    standins, port = _start_standins(args.rows, args.latency)
+    try:
+        # config reads the environment on import, so it has to be in place first
+        os.environ.update(_child_env(port, args))
+        result = asyncio.run(run_load(args, f'http://127.0.0.1:{port}/stats'))
+    finally:
+        standins.terminate()
+        standins.wait()
+        if args.mongo_uri:
+            from pymongo import MongoClient
+            MongoClient(args.mongo_uri).drop_database(os.environ['MONGO_DB_NAME'])
+    report(result, args)
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Local JSON-RPC stand-in for the Arbitrum node.
+
+Serves a synthetic chain holding ERC-20 `Transfer` logs for one token so the
+log indexer, batched reads and Multicall3 path can run without a real node:
+
+    python -m bench.rpc_standin --transfers 100000 --port 8545
+    ARBITRUM_RPC_URL=http://127.0.0.1:8545/ LEDGER_SOURCE=logs python main.py
+
+Like public providers it refuses `eth_getLogs` ranges that match more than
+`--max-logs` entries with error -32005.
+"""
+import argparse
+import asyncio
+import bisect
+import random
+from collections import Counter
+
+from aiohttp import web
+from eth_abi import decode, encode
+
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+DEAD_ADDRESS = '0x000000000000000000000000000000000000dead'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+TOKEN_ADDRESS = '0xd44257dde89ca53f1471582f718632e690e46dc2'
+MULTICALL3_ADDRESS = '0xca11bde05977b3631167028862be2a173976ca11'
+ARBITRUM_CHAIN_ID = 42161
+
+
+def _topic(address):
+    return '0x' + address.lower()[2:].rjust(64, '0')
+
+
+class RPCFault(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class ChainFixture:
+    """A deterministic synthetic token history.
+
+    `transfers` logs are spread over `[first_block, head]`; `burn_ratio` of
+    them go to the dead or zero address and the rest to random holders.
+    """
+
+    def __init__(self, transfers=10000, burn_ratio=0.5, first_block=100_000_000, head=None,
+                 genesis_timestamp=1_700_000_000, block_time=0.25, total_supply=10 ** 27, seed=1):
+        rng = random.Random(seed)
+        self.first_block = first_block
+        self.head = head or first_block + max(1, transfers) * 20
+        self.genesis_timestamp = genesis_timestamp
+        self.block_time = block_time
+        self.total_supply = total_supply
+        self.token = TOKEN_ADDRESS
+
+        blocks = sorted(rng.randint(first_block, self.head) for _ in range(transfers))
+        self.blocks = blocks
+        self.logs = []
+        self.balances = Counter()
+        for i, block in enumerate(blocks):
+            if rng.random() < burn_ratio:
+                to = DEAD_ADDRESS if rng.random() < 0.8 else ZERO_ADDRESS
+            else:
+                to = '0x' + '%040x' % rng.getrandbits(160)
+            sender = '0x' + '%040x' % rng.getrandbits(160)
+            value = rng.randint(1, 10 ** 6) * 10 ** 18
+            self.balances[to] += value
+            self.logs.append({
+                'address': self.token,
+                'blockNumber': hex(block),
+                'transactionHash': '0x%064x' % (i + 1),
+                'logIndex': hex(0),
+                'topics': [TRANSFER_TOPIC, _topic(sender), _topic(to)],
+                'data': '0x' + '%064x' % value,
+                'to': to,
+            })
+
+    def timestamp(self, block):
+        return int(self.genesis_timestamp + (block - self.first_block) * self.block_time)
+
+    def logs_between(self, from_block, to_block):
+        lo = bisect.bisect_left(self.blocks, from_block)
+        hi = bisect.bisect_right(self.blocks, to_block)
+        return self.logs[lo:hi]
+
+
+class RPCStandin:
+    def __init__(self, fixture, max_logs=10000, latency=0.0):
+        self.fixture = fixture
+        self.max_logs = max_logs
+        self.latency = latency
+        self.calls = Counter()
+
+    def _eth_call(self, to, data):
+        selector, payload = data[2:10], bytes.fromhex(data[10:])
+        if to.lower() == MULTICALL3_ADDRESS and selector == '82ad56cb':
+            (calls,) = decode(['(address,bool,bytes)[]'], payload)
+            results = [(True, bytes.fromhex(self._eth_call(target, '0x' + call_data.hex())[2:]))
+                       for target, _, call_data in calls]
+            return '0x' + encode(['(bool,bytes)[]'], [results]).hex()
+        if selector == '18160ddd':
+            return '0x' + encode(['uint256'], [self.fixture.total_supply]).hex()
+        if selector == '70a08231':
+            (address,) = decode(['address'], payload)
+            return '0x' + encode(['uint256'], [self.fixture.balances[address.lower()]]).hex()
+        raise ValueError(f"unsupported eth_call selector {selector}")
+
+    def handle(self, request):
+        method, params = request['method'], request.get('params', [])
+        self.calls[method] += 1
+        if method == 'eth_chainId':
+            return hex(ARBITRUM_CHAIN_ID)
+        if method == 'eth_blockNumber':
+            return hex(self.fixture.head)
+        if method == 'eth_getBlockByNumber':
+            number = int(params[0], 16) if params[0] != 'latest' else self.fixture.head
+            return {'number': hex(number), 'timestamp': hex(self.fixture.timestamp(number))}
+        if method == 'eth_getLogs':
+            query = params[0]
+            from_block = int(query.get('fromBlock', '0x0'), 16)
+            to_block = self.fixture.head if query.get('toBlock', 'latest') == 'latest' else int(query['toBlock'], 16)
+            topics = query.get('topics') or []
+            wanted = topics[2] if len(topics) > 2 and topics[2] else None
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            wanted = {topic.lower() for topic in wanted} if wanted else None
+            logs = [
+                {key: value for key, value in log.items() if key != 'to'}
+                for log in self.fixture.logs_between(from_block, to_block)
+                if wanted is None or log['topics'][2] in wanted
+            ]
+            if len(logs) > self.max_logs:
+                raise RPCFault(-32005, f"query returned more than {self.max_logs} results")
+            return logs
+        if method == 'eth_call':
+            return self._eth_call(params[0]['to'], params[0]['data'])
+        raise RPCFault(-32601, f"the method {method} does not exist/is not available")
+
+    def _answer(self, request):
+        try:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': self.handle(request)}
+        except RPCFault as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': e.code, 'message': str(e)}}
+
+    async def endpoint(self, http_request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = await http_request.json()
+        if isinstance(body, list):
+            return web.json_response([self._answer(item) for item in body])
+        return web.json_response(self._answer(body))
+
+    def app(self):
+        application = web.Application()
+        application.router.add_post('/', self.endpoint)
+        return application
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transfers', type=int, default=10000)
+    parser.add_argument('--max-logs', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8545)
+    args = parser.parse_args()
+
+    standin = RPCStandin(ChainFixture(transfers=args.transfers), max_logs=args.max_logs, latency=args.latency)
+    web.run_app(standin.app(), host='127.0.0.1', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
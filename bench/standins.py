@@ -0,0 +1,119 @@
+"""Local stand-ins for Arbiscan, DexView and the JSON-RPC node.
+
+    python -m bench.standins --rows 100000 --port 8600
+    ARBISCAN_API_URL=http://127.0.0.1:8600/api DEXVIEW_API_URL=http://127.0.0.1:8600 \\
+        ARBITRUM_RPC_URL=http://127.0.0.1:8600/rpc/ python main.py
+
+Arbiscan serves `txlist`, `tokentx`, `getblocknobytime` and the
+`eth_blockNumber` proxy from a synthetic `TransferHistory`, capping list
+pages at 10,000 rows like the real API. The RPC node is `bench.rpc_standin`.
+"""
+import argparse
+import asyncio
+import json
+from collections import Counter
+
+from aiohttp import web
+
+from .fixtures import TransferHistory
+from .rpc_standin import ChainFixture, RPCStandin
+
+MAX_ROWS = 10000
+
+
+class ArbiscanStandin:
+    def __init__(self, history, latency=0.0):
+        self.history = history
+        self.latency = latency
+        self.calls = Counter()
+
+    @staticmethod
+    def _page(indices, query):
+        if query.get('sort') == 'desc':
+            indices = indices[::-1]
+        offset = min(int(query.get('offset', MAX_ROWS)), MAX_ROWS)
+        page = int(query.get('page', 1))
+        return indices[(page - 1) * offset:page * offset]
+
+    def handle(self, query):
+        action = query.get('action')
+        self.calls[action] += 1
+        history = self.history
+        if action == 'eth_blockNumber':
+            return {'jsonrpc': '2.0', 'id': 83, 'result': hex(history.head)}
+        if action == 'getblocknobytime':
+            return {'status': '1', 'message': 'OK',
+                    'result': str(history.block_at(query['timestamp'], query.get('closest', 'before')))}
+
+        start_block = int(query.get('startblock', 0))
+        end_block = int(query.get('endblock', history.head))
+        if action == 'txlist':
+            if query.get('address', '').lower() != history.token:
+                rows = []
+            else:
+                indices = history.rows_between(start_block, end_block)
+                rows = [history.txlist_row(i) for i in self._page(indices, query)]
+        elif action == 'tokentx':
+            if query.get('contractaddress', '').lower() != history.token:
+                rows = []
+            else:
+                indices = history.burn_rows_between(query.get('address', ''), start_block, end_block)
+                rows = [history.tokentx_row(i) for i in self._page(indices, query)]
+        else:
+            return {'status': '0', 'message': 'NOTOK', 'result': f'Unsupported action {action}'}
+
+        if not rows:
+            return {'status': '0', 'message': 'No transactions found', 'result': []}
+        return {'status': '1', 'message': 'OK', 'result': rows}
+
+    async def endpoint(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.Response(text=json.dumps(self.handle(request.query)), content_type='application/json')
+
+
+class DexViewStandin:
+    def __init__(self, price_usd=0.0001234, liquidity_usd=250000.0, latency=0.0):
+        self.price_usd = price_usd
+        self.liquidity_usd = liquidity_usd
+        self.latency = latency
+        self.calls = Counter()
+
+    async def endpoint(self, request):
+        self.calls['tokens'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        pairs = [{
+            'baseToken': {'address': address},
+            'priceUsd': str(self.price_usd),
+            'liquidity': {'usd': self.liquidity_usd},
+        } for address in request.match_info['addresses'].split(',')]
+        return web.json_response({'pairs': pairs})
+
+
+def build_app(rows=10000, latency=0.0, seed=1):
+    history = TransferHistory(rows=rows, seed=seed)
+    arbiscan = ArbiscanStandin(history, latency=latency)
+    dexview = DexViewStandin(latency=latency)
+    rpc = RPCStandin(ChainFixture(transfers=1000, seed=seed), latency=latency)
+
+    application = web.Application()
+    application.router.add_get('/api', arbiscan.endpoint)
+    application.router.add_get('/latest/dex/tokens/{addresses}', dexview.endpoint)
+    application.router.add_get('/stats', lambda request: web.json_response({
+        'arbiscan': arbiscan.calls, 'dexview': dexview.calls, 'rpc': rpc.calls}))
+    application.add_subapp('/rpc/', rpc.app())
+    return application
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+    web.run_app(build_app(args.rows, args.latency), host='127.0.0.1', port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
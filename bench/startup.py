@@ -0,0 +1,82 @@
+"""Measure how long `import main` takes and check it touches no network.
+
+    python -m bench.startup --runs 5 --max-seconds 8
+
+Each run imports the bot in a fresh interpreter with socket connects and
+DNS lookups replaced by a function that raises, so any module doing I/O at
+import time fails the run instead of quietly slowing startup down. Exits
+non-zero when an import fails or the median exceeds `--max-seconds`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import socket, time
+
+def _no_network(*args, **kwargs):
+    raise RuntimeError('network access during import')
+
+socket.socket.connect = _no_network
+socket.socket.connect_ex = _no_network
+socket.getaddrinfo = _no_network
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+# Placeholders so config can be imported without a real .env.
+DEFAULT_ENV = {
+    'TOKEN': '123456:startup-bench',
+    'MONGO_URI': 'mongodb://127.0.0.1:1',
+    'MONGO_DB_NAME': 'bench',
+    'MONGO_COLLECTION': 'chats',
+}
+
+
+def measure(module, env):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', PROBE.format(module=module)],
+                             cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr else 'import failed')
+    return float(process.stdout.strip().splitlines()[-1]), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=8.0)
+    args = parser.parse_args()
+
+    env = dict(DEFAULT_ENV, **os.environ)
+    env['PYTHONPATH'] = str(ROOT)
+    imports, walls = [], []
+    for _ in range(args.runs):
+        try:
+            import_time, wall = measure(args.module, env)
+        except RuntimeError as e:
+            print(f"import {args.module} failed: {e}")
+            return 1
+        imports.append(import_time)
+        walls.append(wall)
+
+    median = statistics.median(imports)
+    print(f"import {args.module}: median {median:.3f}s, min {min(imports):.3f}s, max {max(imports):.3f}s "
+          f"(process wall median {statistics.median(walls):.3f}s over {args.runs} runs)")
+    if median > args.max_seconds:
+        print(f"over budget of {args.max_seconds:.3f}s")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""Offline benchmarks for the burn and report hot paths.
+
+    python -m bench.suite --rows 1000,10000,100000 --repeat 5
+    python -m bench.suite --rows 1000000 --cases transactions_by_date,monthly_report
+    python -m bench.suite --save-baseline bench/baseline.json
+    python -m bench.suite --baseline bench/baseline.json --tolerance 0.2
+
+For every row count a `bench.standins` server is started with a synthetic
+history of that many `transfer()` calls. Each case then runs in its own
+interpreter, so caches start cold and peak RSS belongs to that case alone.
+Cases that need the ledger run only with `--mongo-uri`; they use a
+throwaway database that is dropped afterwards.
+
+Throughput is fixture rows per second at the median run. Against a
+baseline, a case regresses when its p50 or peak RSS grows by more than
+`--tolerance`, and the exit status is then non-zero.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    # name -> needs Mongo
+    'transactions_by_date': False,
+    'create_transaction_report': False,
+    'monthly_report': False,
+    'burnt_tokens': True,
+    'burnt_tokens_weekly': True,
+    'week_statistics': True,
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# --- child side: runs one case against the stand-ins named in the environment ---
+
+def _reset_caches():
+    from utils import asyncUtils, blocks, prices
+    for func in (asyncUtils.fetch_transactions_by_date, asyncUtils.get_burnt_tokens,
+                 asyncUtils.get_burnt_tokens_weekly, asyncUtils.fetch_onchain_burn_state,
+                 asyncUtils.fetch_onchain_burn_states, prices.dexview_quotes):
+        func.cache_clear()
+    blocks._block_index.clear()
+
+
+async def _fetch(days):
+    from config import CONTRACT_ADDRESS, api_key
+    from utils.asyncUtils import fetch_transactions_by_date
+    now = datetime.utcnow()
+    return await fetch_transactions_by_date(CONTRACT_ADDRESS, api_key, now - timedelta(days=days), now)
+
+
+async def _drop_ledger():
+    from config import LEDGER_COLLECTION, SYNC_COLLECTION
+    from utils import ledger
+    from utils.db import get_collection
+    await get_collection(LEDGER_COLLECTION).drop()
+    await get_collection(SYNC_COLLECTION).drop()
+    ledger._indexes_ready = False
+
+
+async def _run_case(case, repeat):
+    """Returns (durations, result size of the last run)."""
+    from config import CONTRACT_ADDRESS
+    from utils.asyncUtils import get_burnt_tokens, get_burnt_tokens_weekly
+    from utils.decode import decode_transfers
+    from utils.report import export_report
+
+    durations = []
+    size = None
+    transactions = None
+    if case == 'create_transaction_report':
+        transactions = await _fetch(30)
+    if case in ('burnt_tokens_weekly', 'week_statistics'):
+        await _drop_ledger()
+        await get_burnt_tokens(CONTRACT_ADDRESS)
+
+    for _ in range(repeat):
+        _reset_caches()
+        if case == 'burnt_tokens':
+            await _drop_ledger()
+
+        started = time.perf_counter()
+        if case == 'transactions_by_date':
+            size = len(await _fetch(7))
+        elif case == 'create_transaction_report':
+            from handlers.create_file.create_file import create_transaction_report
+            size = 0
+            async with create_transaction_report(transactions) as document:
+                async for chunk in document.read(None):
+                    size += len(chunk)
+        elif case == 'monthly_report':
+            size = 0
+            async with export_report(decode_transfers(await _fetch(30))) as document:
+                async for chunk in document.read(None):
+                    size += len(chunk)
+        elif case == 'burnt_tokens':
+            size = await get_burnt_tokens(CONTRACT_ADDRESS)
+        elif case == 'burnt_tokens_weekly':
+            size = await get_burnt_tokens_weekly(CONTRACT_ADDRESS)
+        elif case == 'week_statistics':
+            from handlers.commands import render_week_statistics
+            from utils.snapshots import compute_week_statistics
+            from utils.tokens import default_token
+            token = default_token()
+            stats = await compute_week_statistics([token])
+            size = len(render_week_statistics(token, stats['tokens'][token.key], 'Weekly Token Report'))
+        durations.append(time.perf_counter() - started)
+
+    return durations, size
+
+
+async def _child(case, repeat):
+    from utils.http_client import close_http_client
+    from utils.db import close_db, get_client
+    from config import MONGO_DB_NAME
+    # import everything up front so the growth column shows the work, not the imports
+    import handlers.commands, handlers.create_file.create_file, utils.report, utils.snapshots  # noqa: F401
+
+    rss_before = peak_rss_mb()
+    try:
+        durations, size = await _run_case(case, repeat)
+    finally:
+        if CASES[case]:
+            await get_client().drop_database(MONGO_DB_NAME)
+            close_db()
+        await close_http_client()
+    return {'durations': durations, 'result': size, 'rss_before_mb': rss_before, 'peak_rss_mb': peak_rss_mb()}
+
+
+# --- parent side ---
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_standins(rows, latency):
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'bench.standins', '--rows', str(rows), '--port', str(port),
+                                '--latency', str(latency)], cwd=ROOT)
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/stats', timeout=1).read()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('stand-in server exited')
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('stand-in server did not start')
+
+
+def _child_env(port, args):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': str(ROOT),
+        'TOKEN': env.get('TOKEN', '123456:bench'),
+        'API_KEY': 'bench',
+        'ARBISCAN_API_URL': f'http://127.0.0.1:{port}/api',
+        'ARBISCAN_RPS': str(args.rps),
+        'ARBITRUM_RPC_URL': f'http://127.0.0.1:{port}/rpc/',
+        'DEXVIEW_API_URL': f'http://127.0.0.1:{port}',
+        'PRICE_SOURCES': 'dexview',
+        'TOKENS_FILE': str(ROOT / 'bench' / 'no-tokens.json'),
+        'LEDGER_SOURCE': 'arbiscan',
+        'MONGO_URI': args.mongo_uri or 'mongodb://127.0.0.1:1',
+        'MONGO_DB_NAME': f'tokens_bench_{os.getpid()}',
+        'MONGO_COLLECTION': 'chats',
+    })
+    return env
+
+
+def _run_child(case, rows, port, args):
+    process = subprocess.run([sys.executable, '-m', 'bench.suite', '--child', case, '--repeat', str(args.repeat)],
+                             cwd=ROOT, env=_child_env(port, args), capture_output=True, text=True)
+    if process.returncode != 0:
+        tail = process.stderr.strip().splitlines()[-1:] or ['no output']
+        return {'error': tail[0]}
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    durations = result['durations']
+    p50 = percentile(durations, 0.5)
+    return {
+        'p50': p50,
+        'p99': percentile(durations, 0.99),
+        'throughput': rows / p50 if p50 else None,
+        'peak_rss_mb': result['peak_rss_mb'],
+        'rss_growth_mb': result['peak_rss_mb'] - result['rss_before_mb'],
+        'result': result['result'],
+    }
+
+
+def _compare(key, result, baseline, tolerance):
+    base = baseline.get(key)
+    if not base or 'error' in result:
+        return ''
+    notes = []
+    for metric in ('p50', 'peak_rss_mb'):
+        ratio = result[metric] / base[metric] if base.get(metric) else 1.0
+        flag = ' REGRESSION' if ratio > 1 + tolerance else ''
+        notes.append(f"{metric} x{ratio:.2f}{flag}")
+    return '  ' + ', '.join(notes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help='comma-separated fixture sizes, up to 1000000')
+    parser.add_argument('--cases', default=','.join(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='added per stand-in response, in seconds')
+    parser.add_argument('--rps', type=float, default=1000, help='Arbiscan rate limit used by the code under test')
+    parser.add_argument('--mongo-uri', default=os.environ.get('BENCH_MONGO_URI'))
+    parser.add_argument('--baseline')
+    parser.add_argument('--save-baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child, args.repeat))))
+        return 0
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    regressions = 0
+    print(f"{'case':<28}{'rows':>9}{'p50 s':>10}{'p99 s':>10}{'rows/s':>12}{'peak MB':>10}{'+MB':>8}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        standins, port = _start_standins(rows, args.latency)
+        try:
+            for case in cases:
+                if CASES[case] and not args.mongo_uri:
+                    print(f"{case:<28}{rows:>9}  skipped (needs --mongo-uri)")
+                    continue
+                key = f"{case}@{rows}"
+                result = results[key] = _run_child(case, rows, port, args)
+                if 'error' in result:
+                    print(f"{case:<28}{rows:>9}  failed: {result['error']}")
+                    continue
+                comparison = _compare(key, result, baseline, args.tolerance)
+                regressions += 'REGRESSION' in comparison
+                print(f"{case:<28}{rows:>9}{result['p50']:>10.3f}{result['p99']:>10.3f}"
+                      f"{result['throughput']:>12.0f}{result['peak_rss_mb']:>10.1f}{result['rss_growth_mb']:>8.1f}"
+                      f"{comparison}")
+        finally:
+            standins.terminate()
+            standins.wait()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump({key: value for key, value in results.items() if 'error' not in value}, baseline_file,
+                      indent=2, sort_keys=True)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
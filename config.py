@@ -1,39 +1,121 @@
-import asyncio
+import os
+import socket
 from os import getenv
 import json
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path
-from web3 import Web3
-import motor.motor_asyncio
 load_dotenv()
 
 config_dir = Path(__file__).parent
 
 abi_file_path = config_dir / 'contract_abi.json'
 
-with open(abi_file_path, 'r') as abi_file:
-    api_response = json.load(abi_file)
-
 TELEGRAM_TOKEN = getenv("TOKEN")
 
-ARBITRUM_RPC_URL = 'https://arb1.arbitrum.io/rpc'
+ARBITRUM_RPC_URL = getenv("ARBITRUM_RPC_URL", 'https://arb1.arbitrum.io/rpc')
 
 CONTRACT_ADDRESS = '0xD44257ddE89ca53F1471582f718632e690e46Dc2'
+TOKEN_SYMBOL = getenv("TOKEN_SYMBOL", "S")
+# JSON list of tracked tokens; without it the bot tracks CONTRACT_ADDRESS only
+TOKENS_FILE = getenv("TOKENS_FILE", str(config_dir / 'tokens.json'))
+
 
-CONTRACT_ABI = json.loads(api_response['result'])
 
-w3 = Web3(Web3.HTTPProvider(ARBITRUM_RPC_URL))
+@lru_cache(maxsize=None)
+def get_contract_abi():
+    """Parse contract_abi.json on first use rather than at import."""
+    with open(abi_file_path, 'r') as abi_file:
+        api_response = json.load(abi_file)
+    return json.loads(api_response['result'])
 
-contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
 
 api_key = getenv("API_KEY")
 
+ARBISCAN_API_URL = getenv("ARBISCAN_API_URL", "https://api.arbiscan.io/api")
+ARBISCAN_RPS = float(getenv("ARBISCAN_RPS", 5))
+# "onchain" reads burned supply from burn address balances, "ledger" sums the transfer history
+BURN_SOURCE = getenv("BURN_SOURCE", "onchain")
+# where the burn ledger gets transfers from: "arbiscan" (tokentx) or "logs" (eth_getLogs on the RPC node)
+LEDGER_SOURCE = getenv("LEDGER_SOURCE", "arbiscan")
+LOG_START_BLOCK = int(getenv("LOG_START_BLOCK", 0))
+LOG_CHUNK_SIZE = int(getenv("LOG_CHUNK_SIZE", 100000))
+LOG_MAX_CHUNK_SIZE = int(getenv("LOG_MAX_CHUNK_SIZE", 2000000))
+LOG_CHUNK_CONCURRENCY = int(getenv("LOG_CHUNK_CONCURRENCY", 4))
+BLOCK_INDEX_GRANULARITY = int(getenv("BLOCK_INDEX_GRANULARITY", 300))
+
 headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
         'Accept': 'application/json',  # Assuming JSON responses are expected
         'Content-Type': 'application/json'  # If you're sending data to the API, specify the content type
     }
 
+HTTP_TOTAL_TIMEOUT = float(getenv("HTTP_TOTAL_TIMEOUT", 30))
+HTTP_CONNECT_TIMEOUT = float(getenv("HTTP_CONNECT_TIMEOUT", 10))
+HTTP_POOL_LIMIT = int(getenv("HTTP_POOL_LIMIT", 100))
+HTTP_LIMIT_PER_HOST = int(getenv("HTTP_LIMIT_PER_HOST", 10))
+HTTP_KEEPALIVE_TIMEOUT = float(getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+HTTP_DNS_TTL = int(getenv("HTTP_DNS_TTL", 300))
+
+# setting WEBHOOK_URL switches from long polling to webhook mode
+WEBHOOK_URL = getenv("WEBHOOK_URL")
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "/telegram/webhook")
+# required in webhook mode and the same on every replica
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET")
+WEBHOOK_CONCURRENCY = int(getenv("WEBHOOK_CONCURRENCY", 50))
+WEBHOOK_MAX_PENDING = int(getenv("WEBHOOK_MAX_PENDING", 1000))
+# keep the webhook registered on shutdown (the default) so a rolling restart of one replica does not cut off
+# the others; set to 0 when the last replica goes away for good. Polling mode removes it on startup.
+WEBHOOK_KEEP_ON_SHUTDOWN = getenv("WEBHOOK_KEEP_ON_SHUTDOWN", "1").lower() in ("1", "true", "yes")
+
+# cluster coordination: the lease holder runs scheduled jobs, FSM state lives in Mongo
+INSTANCE_ID = getenv("INSTANCE_ID", f"{socket.gethostname()}:{os.getpid()}")
+LEADER_LEASE_TTL = float(getenv("LEADER_LEASE_TTL", 30))
+FSM_STORAGE = getenv("FSM_STORAGE", "mongo")
+
+BROADCAST_RATE = float(getenv("BROADCAST_RATE", 25))
+BROADCAST_CONCURRENCY = int(getenv("BROADCAST_CONCURRENCY", 20))
+BROADCAST_DRY_RUN = getenv("BROADCAST_DRY_RUN", "").lower() in ("1", "true", "yes")
+
+SUBSCRIBER_FLUSH_INTERVAL = float(getenv("SUBSCRIBER_FLUSH_INTERVAL", 5))
+SUBSCRIBER_FLUSH_BATCH = int(getenv("SUBSCRIBER_FLUSH_BATCH", 100))
+
+# price sources in their initial order; the aggregator reorders them by observed latency
+PRICE_SOURCES = [name.strip() for name in getenv("PRICE_SOURCES", "dexview,geckoterminal,dextools").split(",")
+                 if name.strip()]
+PRICE_CACHE_TTL = float(getenv("PRICE_CACHE_TTL", 30))
+PRICE_HEDGE_DELAY = float(getenv("PRICE_HEDGE_DELAY", 0.5))
+PRICE_TIMEOUT = float(getenv("PRICE_TIMEOUT", 10))
+DEXVIEW_API_URL = getenv("DEXVIEW_API_URL", "https://openapi.dexview.com")
+GECKOTERMINAL_API_URL = getenv("GECKOTERMINAL_API_URL", "https://api.geckoterminal.com")
+# DexView accepts up to this many comma-separated token addresses per request
+DEXVIEW_BATCH_SIZE = int(getenv("DEXVIEW_BATCH_SIZE", 30))
+GECKOTERMINAL_NETWORK = getenv("GECKOTERMINAL_NETWORK", "arbitrum")
+DEXTOOLS_API_URL = getenv("DEXTOOLS_API_URL", "https://dextools-api.p.rapidapi.com")
+DEXTOOLS_API_KEY = getenv("DEXTOOLS_API_KEY")
+
+# weekly report snapshots: recomputed every interval, refreshed early once older than stale_after
+SNAPSHOT_REFRESH_INTERVAL = float(getenv("SNAPSHOT_REFRESH_INTERVAL", 300))
+SNAPSHOT_STALE_AFTER = float(getenv("SNAPSHOT_STALE_AFTER", 600))
+# how long a replica serves its in-memory copy before re-reading Mongo
+SNAPSHOT_READ_TTL = float(getenv("SNAPSHOT_READ_TTL", 15))
+# on-chain burn balances are compared with the ledger on this cron schedule (BURN_SOURCE=onchain only)
+BURN_CROSS_CHECK_CRON = getenv("BURN_CROSS_CHECK_CRON", "40 * * * *")
+# in-memory burn index used by range queries: seconds between ledger syncs
+BURN_INDEX_REFRESH = float(getenv("BURN_INDEX_REFRESH", 60))
+# "last N burns": how many of the newest burns are kept, how long they are served before
+# looking for newer ones, and the first txlist page size of that lookup (doubled on every further page)
+RECENT_BURNS_SIZE = int(getenv("RECENT_BURNS_SIZE", 20))
+RECENT_BURNS_TTL = float(getenv("RECENT_BURNS_TTL", 30))
+RECENT_BURNS_PAGE_SIZE = int(getenv("RECENT_BURNS_PAGE_SIZE", 50))
+
+REPORT_FORMAT = getenv("REPORT_FORMAT", "txt")
+REPORT_SPOOL_SIZE = int(getenv("REPORT_SPOOL_SIZE", 1024 * 1024))
+# weekly charts need matplotlib; without it, or if rendering fails, REPORT_PHOTO is sent instead
+REPORT_PHOTO = getenv("REPORT_PHOTO", "AgACAgIAAxkBAAICNmZBDDMHwAsaQ-HklZlQLX_tatwdAALl3TEbaU8ISkKOB1wyeJOOAQADAgADeQADNQQ")
+CHART_WORKERS = int(getenv("CHART_WORKERS", 1))
+CHART_CACHE_SIZE = int(getenv("CHART_CACHE_SIZE", 32))
+
 text_list = [
         "🖐 Last 5 Transactions",
         "🔟 Last 10 Transactions",
@@ -47,7 +129,13 @@ callback_data_list = [
         "burn_custom_range"
     ]
 
-db_client = motor.motor_asyncio.AsyncIOMotorClient(getenv("MONGO_URI"), tlsAllowInvalidCertificates=True)
-
-db = db_client[getenv("MONGO_DB_NAME")]
-chat_collection = db[getenv("MONGO_COLLECTION")]
+# The Mongo client itself is created lazily by utils.db
+MONGO_URI = getenv("MONGO_URI")
+MONGO_DB_NAME = getenv("MONGO_DB_NAME")
+CHAT_COLLECTION = getenv("MONGO_COLLECTION")
+LEDGER_COLLECTION = getenv("MONGO_LEDGER_COLLECTION", "burn_ledger")
+SYNC_COLLECTION = getenv("MONGO_SYNC_COLLECTION", "sync_state")
+BROADCAST_COLLECTION = getenv("MONGO_BROADCAST_COLLECTION", "broadcasts")
+SNAPSHOT_COLLECTION = getenv("MONGO_SNAPSHOT_COLLECTION", "snapshots")
+LEASE_COLLECTION = getenv("MONGO_LEASE_COLLECTION", "leases")
+FSM_COLLECTION = getenv("MONGO_FSM_COLLECTION", "fsm")
@@ -1,24 +1,120 @@
 import asyncio
+import logging
+import re
 from datetime import datetime, timedelta
 
+import aiohttp
 from aiogram import Router, types
-from aiogram.filters import Command, CommandStart
-from aiogram.types import (
-    FSInputFile
-)
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
-
-from config import api_key, text_list, callback_data_list, CONTRACT_ADDRESS, CONTRACT_ABI, ARBITRUM_RPC_URL as RPC_URL
-from utils.asyncUtils import (fetch_total_supply, get_current_supply, get_burned_percent,
-                              fetch_transactions_by_date, get_burnt_tokens_from_trans, calculate_burned_tokens,
-                              fetch_dexview_token_data, add_chat_id, get_burnt_tokens, get_burnt_tokens_weekly
-                              )
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from config import api_key, text_list, callback_data_list, REPORT_FORMAT
+from utils.arbiscan import ArbiscanError
+from utils.asyncUtils import fetch_transactions_by_date, add_chat_id
+from utils.burn_index import get_burn_index
+from utils.charts import send_chart, weekly_chart
+from utils.decode import decode_transfers
+from utils.metrics import HandlerMetricsMiddleware
+from utils.report import REPORT_FORMATS, export_report
+from utils.snapshots import week_statistics_snapshot
+from utils.tokens import all_tokens, default_token, find_token
 from utils.utils import (button_builder, fetch_transactions_by_quantity, format_large_number,
-                         format_price, timestamp_to_datetime
+                         format_price, timestamp_to_datetime, datetime_to_timestamp
                          )
 
 router = Router()
+router.message.middleware(HandlerMetricsMiddleware())
+router.callback_query.middleware(HandlerMetricsMiddleware())
+
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+RANGE_PREVIEW_ROWS = 5
+REPORT_FORMAT_LABELS = {'txt': "📝 As TXT", 'csv': "📊 As CSV", 'jsonl': "🧾 As JSONL"}
+
+
+class CustomRange(StatesGroup):
+    waiting_for_dates = State()
+
+
+def render_week_statistics(token, stats, title):
+    start_date = timestamp_to_datetime(stats['start'])
+    end_date = timestamp_to_datetime(stats['end'])
+    price_usd = "N/A" if stats['price_usd'] is None else format_price(stats['price_usd'])
+    liquidity_usd = "N/A" if stats['liquidity_usd'] is None else format_large_number(stats['liquidity_usd'])
+    return (
+        f"{title}\n\n"
+        f"📅 Date Range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}\n"
+        f"🪙 Token: {token.symbol}\n"
+        f"🔥 Total Burned Tokens in the Last 7 Days: {format_large_number(stats['burned_week'])} Tokens\n"
+        f"🔥 Burned Percentage: {stats['burned_percent']:.2f}%\n"
+        f"🏦 Current Supply: {format_large_number(stats['current_supply'])} Tokens\n"
+        f"💵 Price (USD): ${price_usd}\n"
+        f"💧 Liquidity (USD): ${liquidity_usd}\n\n"
+        f"📈 <a href='{token.chart_url}'>Chart</a> |  "
+        f"💹 <a href='{token.trade_url}'>Trade</a> |  "
+        f"📊 <a href='{token.explorer_url}'>Token</a>"
+    )
+
+
+def split_token(callback_data):
+    """`"burn_last_5@SYM"` -> (`"burn_last_5"`, token); no suffix means the default token."""
+    action, _, symbol = callback_data.partition('@')
+    return action, find_token(symbol)
+
+
+def parse_date_range(text):
+    """`"2024-05-01 2024-05-31"` -> (start, end) unix timestamps covering both whole UTC days, or None."""
+    dates = DATE_PATTERN.findall(text or '')
+    if not 1 <= len(dates) <= 2:
+        return None
+    try:
+        days = sorted(datetime.strptime(date, '%Y-%m-%d') for date in dates)
+    except ValueError:
+        return None
+    return datetime_to_timestamp(days[0]), datetime_to_timestamp(days[-1] + timedelta(days=1)) - 1
+
+
+def render_burn_rows(token, rows):
+    reply_texts = []
+    for _, amount, timestamp, sender, tx_hash in rows:
+        formatted_tokens = format_large_number(amount / token.unit)
+        date = timestamp_to_datetime(timestamp)
+        tx_info = (
+            f"🔥 Burnt Tokens: {formatted_tokens} Tokens\n"
+            f"📅 Date: {date}\n"
+            f"📤 From: {sender}\n"
+            f"🔗 [Hash: {tx_hash[:10]}...]<a href='https://arbiscan.io/tx/{tx_hash}'>View Transaction</a>"
+        )
+        reply_texts.append(tx_info)
+    return '\n\n'.join(reply_texts)
+
+
+def token_suffix(token):
+    """Callback data suffix naming `token`, the inverse of `split_token`."""
+    return '' if token is default_token() else f"@{token.symbol}"
+
+
+async def token_keyboard(token):
+    suffix = token_suffix(token)
+    keyboard = await button_builder(text_list, [data + suffix for data in callback_data_list])
+    keyboard.adjust(1, 1)
+    return keyboard
+
+
+async def report_format_keyboard(token, current):
+    """Buttons that send the monthly report again in each format other than `current`."""
+    formats = [fmt for fmt in REPORT_FORMATS if fmt != current]
+    keyboard = await button_builder([REPORT_FORMAT_LABELS[fmt] for fmt in formats],
+                                    [f"burnLastMonth:{fmt}{token_suffix(token)}" for fmt in formats])
+    keyboard.adjust(len(formats))
+    return keyboard
+
+
+async def token_week_statistics(token):
+    """Snapshot stats of `token`, or None while no snapshot covers it yet."""
+    snapshot = await week_statistics_snapshot.get()
+    if snapshot is None:
+        return None
+    return snapshot['data'].get('tokens', {}).get(token.key)
 
 
 @router.message(CommandStart())
@@ -37,9 +133,10 @@ async def start_handler(message: types.Message):
 async def help_handler(message: types.Message):
     help_message = (
         "🆘 Need some help? Here's what I can do for you:\n\n"
-        "/week_statistics - Fetch and display statistics for the past week.\n"
+        "/week_statistics [symbol] - Fetch and display statistics for the past week.\n"
         "/getid - Find out the ID of the current chat.\n"
-        "/lastburns - Show the most recent token burn transactions.\n"
+        "/lastburns [symbol] - Show the most recent token burn transactions.\n"
+        "/tokens - List the tracked tokens.\n"
         "/subscribe - Sign up for automatic weekly updates sent directly to this chat.\n\n"
         "Simply type any of these commands to get started. If you have any questions or need further assistance, feel free to reach out!"
     )
@@ -53,55 +150,25 @@ async def send_chat_id(message: types.Message):
 
 
 @router.message(Command('week_statistics'))
-async def week_statistics(message: types.Message):
-    web3 = Web3(Web3.HTTPProvider(RPC_URL))
-    web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-    from_address = CONTRACT_ADDRESS
-    now = datetime.utcnow()
-    start_date = now - timedelta(days=7)
-    end_date = now
-
-    contract = web3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDRESS), abi=CONTRACT_ABI)
-    total_supply, burned_amount, transactions = await asyncio.gather(
-        fetch_total_supply(contract),
-        get_burnt_tokens(),
-        fetch_transactions_by_date(from_address, api_key, start_date, end_date)
-    )
-    current_supply = await get_current_supply(burned_amount, total_supply)
-    burned_percent = await get_burned_percent(total_supply, burned_amount)
-
-    if isinstance(transactions, str):
-        await message.answer(transactions)
+async def week_statistics(message: types.Message, command: CommandObject):
+    token = find_token(command.args)
+    if token is None:
+        await message.answer("Unknown token. Use /tokens to see the tracked ones.")
         return
-
-    burned_tokens = await get_burnt_tokens_weekly()
-
-    dex_info = await fetch_dexview_token_data(
-        CONTRACT_ADDRESS)
-    if not dex_info or 'pairs' not in dex_info or len(dex_info['pairs']) == 0:
-        await message.answer("Failed to fetch token data from DexView.")
+    stats = await token_week_statistics(token)
+    if stats is None:
+        await message.answer("Failed to fetch token data. Please try again later.")
         return
 
-    pair_info = dex_info['pairs'][0]  # Assuming we want the first pair
-    price_usd = format_price(pair_info['priceUsd'])
-    liquidity_usd = pair_info['liquidity']['usd']
-    alert_message = "📊 <b>Weekly Token Report</b> 📊"
-    stats_message = (
-        f"{alert_message}\n\n"
-        f"📅 Date Range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}\n"
-        f"🔥 Total Burned Tokens in the Last 7 Days: {format_large_number(burned_tokens)} Tokens\n"
-        f"🔥 Burned Percentage: {burned_percent:.2f}%\n"
-        f"🏦 Current Supply: {format_large_number(current_supply)} Tokens\n"
-        f"💵 Price (USD): ${price_usd}\n"
-        f"💧 Liquidity (USD): ${format_large_number(liquidity_usd)}\n\n"
-        f"📈 <a href='https://www.dextools.io/app/en/arbitrum/pair-explorer/0xbee32bffb0cd21278acd8b00786b6e840e7a7108?t=1715520319056'>Chart</a> |  "
-        f"💹 <a href='https://www.sushi.com/swap?outputCurrency=0xd44257dde89ca53f1471582f718632e690e46dc2'>Trade</a> |  "
-        f"📊 <a href='https://arbiscan.io/address/0xd44257dde89ca53f1471582f718632e690e46dc2'>Token</a>"
-    )
+    caption = render_week_statistics(token, stats, "📊 <b>Weekly Token Report</b> 📊")
+    await send_chart(await weekly_chart(token, stats),
+                     lambda photo: message.answer_photo(photo=photo, caption=caption, parse_mode="HTML"))
+
 
-    await message.answer_photo(
-        photo="AgACAgIAAxkBAAICNmZBDDMHwAsaQ-HklZlQLX_tatwdAALl3TEbaU8ISkKOB1wyeJOOAQADAgADeQADNQQ",
-        caption=stats_message, parse_mode="HTML")
+@router.message(Command('tokens'))
+async def list_tokens(message: types.Message):
+    lines = [f"• {token.symbol} — <code>{token.address}</code>" for token in all_tokens()]
+    await message.answer("🪙 Tracked tokens:\n\n" + "\n".join(lines), parse_mode="HTML")
 
 
 # @router.message()
@@ -112,14 +179,17 @@ async def week_statistics(message: types.Message):
 #     await message.reply(f"Received your photo. File ID: {file_id}")
 
 @router.message(Command('lastburns'))
-async def last_burns(message: types.Message):
-    keyboard = await button_builder(text_list, callback_data_list)
-    keyboard.adjust(1, 1)
+async def last_burns(message: types.Message, command: CommandObject):
+    token = find_token(command.args)
+    if token is None:
+        await message.answer("Unknown token. Use /tokens to see the tracked ones.")
+        return
+    keyboard = await token_keyboard(token)
     await message.answer("Choose the number of transactions or time range:", reply_markup=keyboard.as_markup())
 
 
 @router.message(Command('subscribe'))
-async def send_chat_id(message: types.Message):
+async def subscribe_handler(message: types.Message):
     chat_id = message.chat.id
     await add_chat_id(chat_id)
     await message.reply(f"This chat's ID is: {chat_id}. You will now receive weekly updates.")
@@ -127,55 +197,113 @@ async def send_chat_id(message: types.Message):
 
 @router.callback_query(lambda c: c.data and c.data.startswith('burnLastMonth'))
 async def handle_burn_month_query(callback_query: types.CallbackQuery):
-    from_address = '0xD44257ddE89ca53F1471582f718632e690e46Dc2'
-    now = datetime.utcnow()
+    action, token = split_token(callback_query.data)
+    if token is None:
+        await callback_query.answer("This token is no longer tracked.")
+        return
+    from_address = token.address
+    now = datetime.utcnow().replace(second=0, microsecond=0)
     start_date = now - timedelta(days=30)
     end_date = now
-    transactions = await fetch_transactions_by_date(from_address, api_key, start_date, end_date)
+    # "burnLastMonth:csv" picks the export format, plain "burnLastMonth" uses the default
+    _, _, report_format = action.partition(':')
+    if report_format not in REPORT_FORMATS:
+        report_format = REPORT_FORMAT
+    try:
+        transactions = await fetch_transactions_by_date(from_address, api_key, start_date, end_date)
+    except (ArbiscanError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Failed to fetch transactions of {from_address}: {e}")
+        transactions = []
 
     if transactions:
-        report_filename = await get_burnt_tokens_from_trans(transactions)
-
-        document = FSInputFile(f"{report_filename}")
-        await callback_query.message.answer_document(document,
-                                                     caption="Here is your monthly transaction report.")
+        keyboard = await report_format_keyboard(token, report_format)
+        async with export_report(decode_transfers(transactions), report_format,
+                                 decimals=token.decimals) as document:
+            await callback_query.message.answer_document(document,
+                                                         caption="Here is your monthly transaction report.",
+                                                         reply_markup=keyboard.as_markup())
     else:
         await callback_query.message.answer("No transactions found for the specified criteria.")
 
     await callback_query.answer()
 
 
+@router.callback_query(lambda c: c.data and c.data.partition('@')[0] == 'burn_custom_range')
+async def handle_burn_custom_range(callback_query: types.CallbackQuery, state: FSMContext):
+    _, token = split_token(callback_query.data)
+    if token is None:
+        await callback_query.answer("This token is no longer tracked.")
+        return
+    await state.set_state(CustomRange.waiting_for_dates)
+    await state.update_data(token=token.address)
+    await callback_query.message.answer(
+        f"Send the range for {token.symbol} as two dates in UTC, e.g. <code>2024-05-01 2024-05-31</code>, "
+        f"or a single date for one day. Send <code>cancel</code> to stop.",
+        parse_mode='HTML'
+    )
+    await callback_query.answer()
+    # build the index while the user is typing
+    await get_burn_index(token.address)
+
+
+@router.message(CustomRange.waiting_for_dates)
+async def custom_range_dates(message: types.Message, state: FSMContext):
+    text = (message.text or '').strip()
+    if text.lower() in ('cancel', '/cancel'):
+        await state.clear()
+        await message.answer("Custom range cancelled.")
+        return
+    window = parse_date_range(text)
+    if window is None:
+        await message.answer("Couldn't read that. Send two dates like <code>2024-05-01 2024-05-31</code> "
+                             "or <code>cancel</code>.", parse_mode='HTML')
+        return
+
+    data = await state.get_data()
+    await state.clear()
+    token = find_token(data['token'])
+    if token is None:
+        await message.answer("This token is no longer tracked.")
+        return
+    index = await get_burn_index(token.address)
+    start, end = window
+    count = index.count(start, end)
+    if not count:
+        await message.answer("No burns found in that range.")
+        return
+
+    summary = (
+        f"🔥 {token.symbol} burned from {timestamp_to_datetime(start):%Y-%m-%d} to {timestamp_to_datetime(end):%Y-%m-%d}: "
+        f"{format_large_number(index.total(start, end) / token.unit)} Tokens in {count} transactions"
+    )
+    latest = render_burn_rows(token, reversed(index.rows(start, end, last_n=RANGE_PREVIEW_ROWS)))
+    full_message_text = f"{summary}\n\nLatest in range:\n\n{latest}"
+    if len(full_message_text) > 4096:
+        full_message_text = summary
+    keyboard = await token_keyboard(token)
+    await message.answer(full_message_text, parse_mode='HTML', disable_web_page_preview=True,
+                         reply_markup=keyboard.as_markup())
+
+
 @router.callback_query(lambda c: c.data and c.data.startswith('burn_'))
 async def handle_burn_query(callback_query: types.CallbackQuery):
-    action = callback_query.data
-    from_address = '0xD44257ddE89ca53F1471582f718632e690e46Dc2'
-    to_address = 'dead'
-    transactions = None
+    action, token = split_token(callback_query.data)
+    if token is None:
+        await callback_query.answer("This token is no longer tracked.")
+        return
+    from_address = token.address
+    burns = None
     if action == "burn_last_5":
-        transactions = await fetch_transactions_by_quantity(from_address, to_address, api_key, 5)
+        burns = await fetch_transactions_by_quantity(from_address, api_key, 5)
     elif action == "burn_last_10":
-        transactions = await fetch_transactions_by_quantity(from_address, to_address, api_key, 10)
+        burns = await fetch_transactions_by_quantity(from_address, api_key, 10)
 
-    if transactions:
-        reply_texts = []
-        for tx in transactions:
-            burnt_tokens = await get_burnt_tokens_from_trans(tx)
-            formatted_tokens = format_large_number(burnt_tokens)
-            date = timestamp_to_datetime(tx["timeStamp"])
-            tx_info = (
-                f"🔥 Burnt Tokens: {formatted_tokens} Tokens\n"
-                f"📅 Date: {date}\n"
-                f"📤 From: {tx['from']}\n"
-                f"🔗 [Hash: {tx['hash'][:10]}...]<a href='https://arbiscan.io/tx/{tx['hash']}'>View Transaction</a>"
-            )
-            reply_texts.append(tx_info)
-
-        full_message_text = '\n\n'.join(reply_texts)
+    if burns:
+        full_message_text = render_burn_rows(token, burns)
 
         if len(full_message_text) > 4096:
             full_message_text = "🔥 The message is too long to display. Please check the blockchain explorer."
-        keyboard = await button_builder(text_list, callback_data_list)
-        keyboard.adjust(1, 1)
+        keyboard = await token_keyboard(token)
         await callback_query.message.edit_text(
             full_message_text,
             parse_mode='HTML',
@@ -188,43 +316,14 @@ async def handle_burn_query(callback_query: types.CallbackQuery):
     await callback_query.answer()
 
 
-async def prepare_week_statistics():
-    web3 = Web3(Web3.HTTPProvider(RPC_URL))
-    web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-
-    contract = web3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDRESS), abi=CONTRACT_ABI)
-    total_supply = await fetch_total_supply(contract)
-    burned_amount = await get_burnt_tokens()
-    current_supply = await get_current_supply(burned_amount, total_supply)
-    burned_percent = await get_burned_percent(total_supply, burned_amount)
-
-    from_address = CONTRACT_ADDRESS
-    now = datetime.utcnow()
-    start_date = now - timedelta(days=7)
-    end_date = now
-
-    burned_tokens = await get_burnt_tokens_weekly()
-    dex_info = await fetch_dexview_token_data(
-        CONTRACT_ADDRESS)
-    pair_info = dex_info['pairs'][0]
-    price_usd = format_price(pair_info['priceUsd'])
-    liquidity_usd = pair_info['liquidity']['usd']
-
-    alert_message = "📊 <b>Weekly Token Statistics Report</b> 📊"
-    stats_message = (
-        f"{alert_message}\n\n"
-        f"📅 Date Range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}\n"
-        f"🔥 Total Burned Tokens in the Last 7 Days: {format_large_number(burned_tokens)} Tokens\n"
-        f"🔥 Burned Percentage: {burned_percent:.2f}%\n"
-        f"🏦 Current Supply: {format_large_number(current_supply)} Tokens\n"
-        f"💵 Price (USD): ${price_usd}\n"
-        f"💧 Liquidity (USD): ${format_large_number(liquidity_usd)}\n\n"
-        f"📈 <a href='https://www.dextools.io/app/en/arbitrum/pair-explorer/0xbee32bffb0cd21278acd8b00786b6e840e7a7108?t=1715520319056'>Chart</a> |  "
-        f"💹 <a href='https://www.sushi.com/swap?outputCurrency=0xd44257dde89ca53f1471582f718632e690e46dc2'>Trade</a> |  "
-        f"📊 <a href='https://arbiscan.io/address/0xd44257dde89ca53f1471582f718632e690e46dc2'>Token</a>"
-    )
-
-    return stats_message
+async def prepare_week_statistics(token=None):
+    """(caption, chart) of the weekly broadcast; chart is None when it cannot be drawn."""
+    token = token or default_token()
+    stats = await token_week_statistics(token)
+    if stats is None:
+        raise RuntimeError(f"No weekly statistics snapshot available for {token.symbol}")
+    caption = render_week_statistics(token, stats, "📊 <b>Weekly Token Statistics Report</b> 📊")
+    return caption, await weekly_chart(token, stats)
 
 # async def main():
 #     a = await prepare_week_statistics()
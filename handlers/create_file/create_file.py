@@ -1,44 +1,26 @@
 import asyncio
+import sys
 from datetime import datetime, timedelta
-from config import api_key
-from datetime import datetime
-from utils.utils import format_large_number, timestamp_to_datetime
-from utils.asyncUtils import get_burnt_tokens_from_trans, fetch_transactions_by_date
-import os
+from config import api_key, CONTRACT_ADDRESS
+from utils.asyncUtils import fetch_transactions_by_date
+from utils.decode import decode_transfers
+from utils.report import export_report
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-
-async def create_transaction_report(transactions):
-    filename = os.path.join(BASE_DIR, "", "transaction_report.txt")
-
-    with open(filename, "w") as file:
-        for tx in transactions:
-            burnt_tokens = await get_burnt_tokens_from_trans(tx)
-            formatted_tokens = format_large_number(burnt_tokens)
-            timestamp = int(tx['timeStamp'])
-            date = timestamp_to_datetime(tx['timeStamp'])
-
-            tx_info = (
-                f"Transaction Hash: {tx['hash']}\n"
-                f"From: {tx['from']}\n"
-                f"To: DEAD(((((\n"
-                f"Amount: {formatted_tokens} Tokens\n"  
-                f"Date: {date}\n"  
-                "\n"
-            )
-            file.write(tx_info)
-    return filename
+def create_transaction_report(transactions, fmt="txt"):
+    """The report as an input file inside `async with`; a per-call buffer, never a shared path."""
+    return export_report(decode_transfers(transactions), fmt)
 
 
 async def main():
-    from_address = '0xD44257ddE89ca53F1471582f718632e690e46Dc2'
-    to_address = 'dead'
+    from_address = CONTRACT_ADDRESS
     now = datetime.utcnow()
     start_date = now - timedelta(days=30)
     end_date = now
-    transactions = await fetch_transactions_by_date(from_address, to_address, api_key, start_date, end_date)
-    await create_transaction_report(transactions)
+    transactions = await fetch_transactions_by_date(from_address, api_key, start_date, end_date)
+    async with create_transaction_report(transactions) as document:
+        async for chunk in document.read(None):
+            sys.stdout.buffer.write(chunk)
 
 
 if __name__ == "__main__":
@@ -2,21 +2,39 @@ import logging
 import sys
 import asyncio
 from aiogram import Bot, Dispatcher
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
 from aiogram.client.default import DefaultBotProperties
-from config import TELEGRAM_TOKEN as TOKEN
+from config import (TELEGRAM_TOKEN as TOKEN, BROADCAST_DRY_RUN, WEBHOOK_URL, WEBHOOK_PATH, FSM_STORAGE,
+                    BURN_SOURCE, BURN_CROSS_CHECK_CRON)
 import uvicorn
 from aiogram.client.session.aiohttp import AiohttpSession
 import aiocron
+from pymongo.errors import PyMongoError
 import os
+from datetime import datetime
 from aiogram.fsm.storage.memory import MemoryStorage
 from handlers.commands import router, prepare_week_statistics
-from utils.asyncUtils import get_all_chat_ids, remove_chat_id
+from utils.subscribers import subscribers
+from utils.broadcast import broadcast, is_unfinished
+from utils.charts import close_charts, send_chart
+from utils.fake_session import RecordingSession
+from utils.http_client import start_http_client, close_http_client
+from utils.chain import start_chain
+from utils.db import close_db
+from utils.snapshots import cross_check_all_burned, week_statistics_snapshot
+from utils.webhook import SECRET_HEADER, UpdateFeeder
+from utils.coordination import LeaderLease, MongoStorage, leader_only
+from utils import metrics
 
 app = FastAPI()
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-storage = MemoryStorage()
+storage = MongoStorage() if FSM_STORAGE == 'mongo' else MemoryStorage()
 session = AiohttpSession()
+dp = Dispatcher(storage=storage)
+scheduler_lease = LeaderLease('scheduler')
+dp.include_router(router)
+feeder = UpdateFeeder(dp, bot)
 
 
 @app.get("/")
@@ -24,32 +42,125 @@ async def read_root():
     return {"Hello": "World"}
 
 
+@app.get("/metrics")
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@metrics.collector
+def _runtime_metrics():
+    return [
+        "# TYPE subscribers gauge", f"subscribers {len(subscribers)}",
+        "# TYPE webhook_pending_updates gauge", f"webhook_pending_updates {feeder.pending}",
+        "# TYPE scheduler_leader gauge", f"scheduler_leader {int(scheduler_lease.is_leader)}",
+    ]
+
+
+@app.post(WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    if not WEBHOOK_URL or not feeder.authorized(request.headers.get(SECRET_HEADER)):
+        return Response(status_code=401)
+    try:
+        accepted = feeder.submit(await request.json())
+    except ValueError:
+        return Response(status_code=400)
+    # Telegram redelivers updates answered with an error, so shedding load here loses nothing.
+    return Response(status_code=200 if accepted else 503)
+
+
+week_broadcast_running = False
+
+
+def week_broadcast_id():
+    year, week, _ = datetime.utcnow().isocalendar()
+    return f"week_statistics:{year}-W{week:02d}"
+
+
+@leader_only(scheduler_lease)
 async def scheduled_week_statistics():
-    chat_ids = await get_all_chat_ids()
-    message = await prepare_week_statistics()
-    for chat_id in chat_ids:
-        try:
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo="AgACAgIAAxkBAAICNmZBDDMHwAsaQ-HklZlQLX_tatwdAALl3TEbaU8ISkKOB1wyeJOOAQADAgADeQADNQQ",
-                caption=message, parse_mode="HTML")
+    # the cron tick and a resume after taking over the lease must not run the same broadcast twice
+    global week_broadcast_running
+    if week_broadcast_running:
+        logging.info("Weekly broadcast already running, not starting another")
+        return
+    week_broadcast_running = True
+    try:
+        await send_week_statistics()
+    finally:
+        week_broadcast_running = False
+
+
+async def send_week_statistics():
+    message, chart = await prepare_week_statistics()
+    target = Bot(token=TOKEN, session=RecordingSession()) if BROADCAST_DRY_RUN else bot
+
+    async def send(chat_id):
+        # the chart is uploaded once; later chats get Telegram's file_id
+        await send_chart(chart, lambda photo: target.send_photo(chat_id=chat_id, photo=photo, caption=message,
+                                                                parse_mode="HTML"),
+                         remember=not BROADCAST_DRY_RUN)
+
+    # other replicas may have taken subscriptions since this one started
+    await subscribers.reload()
+    result = await broadcast(
+        subscribers, send,
+        broadcast_id=None if BROADCAST_DRY_RUN else week_broadcast_id(),
+        remove_dead=not BROADCAST_DRY_RUN,
+    )
+    logging.info(f"Weekly broadcast{' (dry run)' if BROADCAST_DRY_RUN else ''} finished: {result}")
+
+
+@scheduler_lease.on_acquire
+async def resume_week_statistics():
+    """Finish this week's broadcast when the previous leader stopped partway through it."""
+    if BROADCAST_DRY_RUN:
+        return
+    try:
+        unfinished = await is_unfinished(week_broadcast_id())
+    except PyMongoError as e:
+        logging.error(f"Could not look for an unfinished weekly broadcast: {e}")
+        return
+    if unfinished:
+        logging.info(f"Resuming unfinished broadcast {week_broadcast_id()}")
+        await scheduled_week_statistics()
+
 
-        except Exception as e:
-            logging.error(f"Failed to send message to chat {chat_id}: {e}")
-            if "chat not found" in str(e):
-                await remove_chat_id(chat_id)
+@leader_only(scheduler_lease)
+async def scheduled_cross_check():
+    await cross_check_all_burned()
 
 
 async def main() -> None:
-    dp = Dispatcher()
-    dp.include_router(router)
-    loop = asyncio.get_event_loop()
-    loop.create_task(dp.start_polling(bot))
+    await start_http_client()
+    await start_chain()
+    await subscribers.start()
+    await scheduler_lease.start()
+    week_statistics_snapshot.start(scheduled=lambda: scheduler_lease.is_leader)
+    if WEBHOOK_URL:
+        await feeder.start()
+    else:
+        # a webhook left registered by an earlier webhook deployment makes every getUpdates fail
+        await bot.delete_webhook(drop_pending_updates=False)
+        loop = asyncio.get_event_loop()
+        loop.create_task(dp.start_polling(bot))
 
     aiocron.crontab('25 13 * * 0', func=scheduled_week_statistics)
+    if BURN_SOURCE == 'onchain':
+        aiocron.crontab(BURN_CROSS_CHECK_CRON, func=scheduled_cross_check)
     config = uvicorn.Config(app=app, host="0.0.0.0", port=int(os.environ.get('PORT', 5001)), loop="auto")
     server = uvicorn.Server(config)
-    await server.serve()
+    try:
+        await server.serve()
+    finally:
+        if WEBHOOK_URL:
+            await feeder.stop()
+        week_statistics_snapshot.stop()
+        await scheduler_lease.stop()
+        await subscribers.stop()
+        await storage.close()
+        await close_http_client()
+        close_charts()
+        close_db()
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, stream=sys.stdout)
@@ -0,0 +1,140 @@
+import os
+import sys
+
+import pytest
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TOKEN', '123456:tests')
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+            for operator, operand in condition.items():
+                if operator == '$gte' and not (value is not None and value >= operand):
+                    return False
+                if operator == '$lte' and not (value is not None and value <= operand):
+                    return False
+                if operator == '$in' and value not in operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents, projection=None):
+        self.documents = documents
+        self.projection = projection
+
+    def sort(self, field, direction=1):
+        self.documents.sort(key=lambda document: document.get(field), reverse=direction < 0)
+        return self
+
+    def _project(self, document):
+        if not self.projection:
+            return dict(document)
+        return {field: document[field] for field, keep in self.projection.items()
+                if keep and field in document}
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield self._project(document)
+
+
+class FakeBulkResult:
+    def __init__(self, upserted_count):
+        self.upserted_count = upserted_count
+
+
+class FakeCollection:
+    """The few Motor collection calls the ledger and snapshots make, kept in a list."""
+
+    def __init__(self):
+        self.documents = []
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def drop_index(self, *args, **kwargs):
+        pass
+
+    async def update_many(self, *args, **kwargs):
+        pass
+
+    async def find_one(self, query, projection=None):
+        for document in self.documents:
+            if _matches(document, query):
+                return dict(document)
+        return None
+
+    def find(self, query=None, projection=None, **kwargs):
+        return FakeCursor([document for document in self.documents if _matches(document, query or {})], projection)
+
+    async def update_one(self, query, update, upsert=False):
+        document, inserted = self._find_or_insert(query, upsert)
+        if document is not None:
+            self._apply(document, update, inserted)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=None):
+        document, inserted = self._find_or_insert(query, upsert)
+        if document is None:
+            return None
+        self._apply(document, update, inserted)
+        return dict(document)
+
+    @staticmethod
+    def _apply(document, update, inserted):
+        if inserted:
+            document.update(update.get('$setOnInsert', {}))
+        document.update(update.get('$set', {}))
+        for field, value in update.get('$max', {}).items():
+            document[field] = max(document.get(field, value), value)
+        for field, value in update.get('$addToSet', {}).items():
+            values = document.setdefault(field, [])
+            if value not in values:
+                values.append(value)
+
+    def _find_or_insert(self, query, upsert):
+        for document in self.documents:
+            if _matches(document, query):
+                return document, False
+        if not upsert:
+            return None, False
+        document = dict(query)
+        self.documents.append(document)
+        return document, True
+
+    async def bulk_write(self, operations, ordered=True):
+        upserted = 0
+        for operation in operations:
+            assert isinstance(operation, UpdateOne)
+            query, update = operation._filter, operation._doc
+            if any(_matches(document, query) for document in self.documents):
+                continue
+            document = dict(query)
+            document.update(update.get('$setOnInsert', {}))
+            self.documents.append(document)
+            upserted += 1
+        return FakeBulkResult(upserted)
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    """Fake collections by name, patched into every module that looks them up."""
+    from utils import broadcast, burn_index, ledger
+
+    fakes = {}
+
+    def get_collection(name):
+        return fakes.setdefault(name, FakeCollection())
+
+    for module in (broadcast, burn_index, ledger):
+        monkeypatch.setattr(module, 'get_collection', get_collection)
+    monkeypatch.setattr(ledger, '_indexes_ready', False)
+    return fakes
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from utils.broadcast import broadcast, is_unfinished
+
+
+class Crash(BaseException):
+    """Stands in for the process dying mid-broadcast."""
+
+
+def test_restarted_broadcast_resumes_where_it_stopped(collections):
+    chats = list(range(1, 11))
+    delivered = []
+
+    async def crash_after_four(chat_id):
+        if len(delivered) == 4:
+            raise Crash()
+        delivered.append(chat_id)
+
+    async def send(chat_id):
+        delivered.append(chat_id)
+
+    async def run():
+        with pytest.raises(Crash):
+            await broadcast(chats, crash_after_four, broadcast_id='weekly', concurrency=1, rate=1000)
+        interrupted = await is_unfinished('weekly')
+        result = await broadcast(chats, send, broadcast_id='weekly', concurrency=1, rate=1000)
+        return interrupted, result, await is_unfinished('weekly')
+
+    interrupted, result, unfinished = asyncio.run(run())
+    assert interrupted
+    assert not unfinished
+    assert (result.sent, result.skipped) == (6, 4)
+    # every chat got exactly one message across both runs
+    assert sorted(delivered) == chats
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from handlers import commands
+from utils.fake_session import RecordingSession
+
+DEAD = '000000000000000000000000000000000000dead'
+
+dispatcher = Dispatcher()
+dispatcher.include_router(commands.router)
+
+
+def _burn(tx_hash, amount):
+    return {'hash': tx_hash, 'from': '0xabc', 'to': commands.default_token().address, 'value': '0',
+            'timeStamp': str(int(time.time()) - 86400), 'isError': '0',
+            'input': '0xa9059cbb' + DEAD.rjust(64, '0') + hex(amount)[2:].rjust(64, '0')}
+
+
+def _click(update_id, data):
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': {'id': 42, 'is_bot': False, 'first_name': 'User'},
+            'chat_instance': '42',
+            'data': data,
+            'message': {'message_id': update_id, 'date': int(time.time()), 'chat': {'id': 42, 'type': 'private'},
+                        'text': 'Choose the number of transactions or time range:'},
+        },
+    }
+
+
+@pytest.fixture
+def sent_documents(monkeypatch):
+    async def fetch_transactions_by_date(*args, **kwargs):
+        return [_burn('0x1', 10 ** 18), _burn('0x2', 5 * 10 ** 18)]
+
+    monkeypatch.setattr(commands, 'fetch_transactions_by_date', fetch_transactions_by_date)
+    monkeypatch.setattr(commands, 'REPORT_FORMAT', 'txt')
+    documents = []
+
+    def responder(method):
+        if method.__api_method__ == 'sendDocument':
+            documents.append(method)
+        return None
+
+    return documents, Bot('123456:tests', session=RecordingSession(responder=responder))
+
+
+def test_month_report_offers_other_formats_and_their_buttons_work(sent_documents):
+    documents, bot = sent_documents
+
+    async def click(update_id, data):
+        await dispatcher.feed_update(bot, Update.model_validate(_click(update_id, data), context={'bot': bot}))
+
+    async def run():
+        await click(1, 'burnLastMonth')
+        buttons = [button for row in documents[0].reply_markup.inline_keyboard for button in row]
+        for update_id, button in enumerate(buttons, start=2):
+            await click(update_id, button.callback_data)
+        return buttons
+
+    buttons = asyncio.run(run())
+    assert [button.callback_data for button in buttons] == ['burnLastMonth:csv', 'burnLastMonth:jsonl']
+    assert [document.document.filename for document in documents] == [
+        'transaction_report.txt', 'transaction_report.csv', 'transaction_report.jsonl']
+    csv = documents[1].document.data.decode()
+    assert csv.splitlines()[0] == 'hash,from,to,amount,amount_raw,date'
+    assert len(csv.splitlines()) == 3
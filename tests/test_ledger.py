@@ -0,0 +1,41 @@
+import asyncio
+
+from utils.ledger import burned_total, store_burn_transfers
+
+CONTRACT = '0xd44257dde89ca53f1471582f718632e690e46dc2'
+DEAD = '0x000000000000000000000000000000000000dead'
+
+
+def _transfer(tx_hash, value, timestamp=1700000000):
+    return {'hash': tx_hash, 'blockNumber': '100', 'timeStamp': str(timestamp), 'from': '0xAbC', 'to': DEAD,
+            'value': str(value)}
+
+
+def test_values_beyond_decimal128_are_stored_and_summed_exactly(collections):
+    # Decimal128 keeps 34 significant digits, so both of these used to round or raise
+    values = [10 ** 30, 10 ** 34 + 1, 2 ** 255 + 7]
+
+    async def run():
+        stored = await store_burn_transfers(CONTRACT, [_transfer(f'0x{i}', value) for i, value in enumerate(values)])
+        return stored, await burned_total(CONTRACT)
+
+    stored, total = asyncio.run(run())
+    assert stored == 3
+    assert total == sum(values)
+
+
+def test_burned_total_window(collections):
+    async def run():
+        await store_burn_transfers(CONTRACT, [_transfer('0x1', 10 ** 30, 100), _transfer('0x2', 5, 200)])
+        return await burned_total(CONTRACT, since=150), await burned_total(CONTRACT, until=150)
+
+    assert asyncio.run(run()) == (5, 10 ** 30)
+
+
+def test_repeated_transfer_is_stored_once(collections):
+    async def run():
+        first = await store_burn_transfers(CONTRACT, [_transfer('0x1', 10 ** 30)])
+        again = await store_burn_transfers(CONTRACT, [_transfer('0x1', 10 ** 30)])
+        return first, again, await burned_total(CONTRACT)
+
+    assert asyncio.run(run()) == (1, 0, 10 ** 30)
@@ -0,0 +1,64 @@
+import asyncio
+
+from utils import arbiscan
+from utils.recent_burns import RecentBurns
+
+DEAD = '000000000000000000000000000000000000dead'
+OTHER = '00000000000000000000000000000000000b0b00'
+BLOCKS = 20000
+BURN_EVERY = 1000
+
+
+def _tx(block):
+    recipient = DEAD if block % BURN_EVERY == 0 else OTHER
+    return {'blockNumber': str(block), 'timeStamp': str(1700000000 + block), 'hash': f'0x{block:064x}',
+            'from': '0xabc', 'to': '0xtoken', 'value': '0', 'isError': '0',
+            'input': '0xa9059cbb' + recipient.rjust(64, '0') + hex(10 ** 18)[2:].rjust(64, '0')}
+
+
+def test_sparse_burns_are_found_in_few_requests(monkeypatch):
+    requests = []
+
+    async def arbiscan_request(params, api_key=None, predicate=None):
+        requests.append(params)
+        start, end = int(params.get('startblock', 0)), int(params.get('endblock', BLOCKS))
+        size, page = int(params['offset']), int(params['page'])
+        assert size * page <= arbiscan.MAX_RESULTS_PER_PAGE
+        rows = [_tx(block) for block in range(min(end, BLOCKS), max(start, 1) - 1, -1)]
+        return rows[(page - 1) * size:page * size]
+
+    monkeypatch.setattr(arbiscan, 'arbiscan_request', arbiscan_request)
+    buffer = RecentBurns('0xtoken', size=5, page_size=50)
+
+    rows = asyncio.run(buffer.latest())
+
+    assert [timestamp - 1700000000 for _, _, timestamp, _, _ in rows] == [20000, 19000, 18000, 17000, 16000]
+    # 50, 100, ..., 3200 rows per page instead of a hundred pages of 50
+    assert len(requests) <= 8
+    assert [int(params['offset']) for params in requests] == sorted(int(params['offset']) for params in requests)
+
+
+def test_stale_buffer_is_served_while_refreshing(monkeypatch):
+    release = None
+
+    async def slow_request(params, api_key=None, predicate=None):
+        await release.wait()
+        return []
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        buffer = RecentBurns('0xtoken', size=5, max_age=30)
+        buffer.rows.extend([('0xdead', 1, 2, '0xabc', '0x1')])
+        buffer.last_block, buffer.updated_at = 100, 1.0
+        monkeypatch.setattr(arbiscan, 'arbiscan_request', slow_request)
+        # the refresh is stuck upstream, callers still get the rows at once
+        rows = await asyncio.wait_for(asyncio.gather(buffer.latest(), buffer.latest()), 1)
+        refreshing = not buffer._update_task.done()
+        release.set()
+        await buffer._update_task
+        return rows, refreshing
+
+    rows, refreshing = asyncio.run(run())
+    assert rows == [[('0xdead', 1, 2, '0xabc', '0x1')]] * 2
+    assert refreshing
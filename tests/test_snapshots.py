@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from utils import asyncUtils, burn_index, snapshots, tokens
+from utils.ledger import BURN_ADDRESSES, store_burn_transfers
+from utils.tokens import Token
+
+# a USDC-like token: 6 decimals, so an 18-decimal assumption would be off by 10**12
+SIX = Token('0xaf88d065e77c8cc2239327c5edb3a432268e5831', 'SIX', decimals=6)
+TOTAL_SUPPLY = 1_000_000 * 10 ** 6
+BURN_BALANCES = [200_000 * 10 ** 6, 50_000 * 10 ** 6]
+BURNED_TODAY = 5 * 10 ** 6
+
+
+class FakeFunction:
+    def __init__(self, result):
+        self.result = result
+
+    async def call(self):
+        return self.result
+
+
+class FakeFunctions:
+    def totalSupply(self):
+        return FakeFunction(TOTAL_SUPPLY)
+
+    def balanceOf(self, address):
+        return FakeFunction(BURN_BALANCES[BURN_ADDRESSES.index(address)])
+
+
+class FakeContract:
+    address = SIX.address
+    functions = FakeFunctions()
+
+
+@pytest.fixture
+def six_decimals(collections, monkeypatch):
+    async def multicall(functions):
+        return [function.result for function in functions]
+
+    async def no_sync(*args, **kwargs):
+        return 0
+
+    async def no_prices(addresses):
+        return {address.lower(): None for address in addresses}
+
+    monkeypatch.setattr(tokens, '_tokens', [SIX])
+    monkeypatch.setattr(asyncUtils, 'multicall', multicall)
+    monkeypatch.setattr(asyncUtils, 'sync_burn_ledger', no_sync)
+    monkeypatch.setattr(burn_index, 'sync_burn_ledger', no_sync)
+    monkeypatch.setattr(burn_index, '_indexes', {})
+    monkeypatch.setattr(snapshots, 'get_contract', lambda address: FakeContract())
+    monkeypatch.setattr(snapshots, 'get_prices', no_prices)
+    for func in (asyncUtils.fetch_total_supply, asyncUtils.get_burnt_tokens, asyncUtils.get_burnt_tokens_weekly,
+                 asyncUtils.fetch_onchain_burn_state, asyncUtils.fetch_onchain_burn_states):
+        func.cache_clear()
+    asyncio.run(store_burn_transfers(SIX.address, [{
+        'hash': '0x1', 'blockNumber': '1', 'timeStamp': str(int(time.time()) - 3600),
+        'from': '0xabc', 'to': BURN_ADDRESSES[0], 'value': str(BURNED_TODAY),
+    }]))
+    return monkeypatch
+
+
+@pytest.mark.parametrize('burn_source, burned', [('onchain', 250_000), ('ledger', 5)])
+def test_week_statistics_scale_by_token_decimals(six_decimals, burn_source, burned):
+    six_decimals.setattr(snapshots, 'BURN_SOURCE', burn_source)
+    six_decimals.setattr(asyncUtils, 'BURN_SOURCE', burn_source)
+
+    stats = asyncio.run(snapshots.compute_week_statistics([SIX]))['tokens'][SIX.key]
+
+    assert stats['total_supply'] == 1_000_000
+    assert stats['burned'] == burned
+    assert stats['current_supply'] == 1_000_000 - burned
+    assert stats['burned_percent'] == pytest.approx(burned / 10_000)
+    assert stats['burned_week'] == 5
+    assert stats['daily_burned']['burned'][-1] == 5
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+
+import aiohttp
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from config import ARBISCAN_API_URL, ARBISCAN_RPS, api_key
+from .http_client import get_session
+from .metrics import track_upstream
+from .rate_limit import FairTokenBucket
+
+MAX_RESULTS_PER_PAGE = 10000
+SPLIT_FACTOR = 4
+RATE_LIMIT_RETRIES = 5
+
+limiter = FairTokenBucket(ARBISCAN_RPS)
+
+
+class ArbiscanError(Exception):
+    pass
+
+
+class _Page:
+    """One decoded Arbiscan response: the rows that passed the filter plus how many were read."""
+    __slots__ = ('status', 'message', 'result', 'rows', 'count')
+
+    def __init__(self):
+        self.status = None
+        self.message = ''
+        self.result = None
+        self.rows = []
+        self.count = 0
+
+    def add(self, row, predicate):
+        self.count += 1
+        if predicate is None or predicate(row):
+            self.rows.append(row)
+
+
+async def _read_page(response, predicate):
+    page = _Page()
+
+    if ijson is None:
+        data = await response.json()
+        page.status = data.get('status')
+        page.message = data.get('message', '')
+        page.result = data.get('result')
+        if isinstance(page.result, list):
+            for row in page.result:
+                page.add(row, predicate)
+            page.result = page.rows
+        return page
+
+    # Rows are built one at a time from parser events and dropped right away
+    # unless they pass `predicate`, so a 10,000-row page never sits in memory.
+    builder = None
+    async for prefix, event, value in ijson.parse_async(response.content):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'result.item' and event == 'end_map':
+                page.add(builder.value, predicate)
+                builder = None
+        elif prefix == 'result.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == 'result' and event == 'start_array':
+            page.result = page.rows
+        elif prefix in ('status', 'message', 'result') and event in ('string', 'number'):
+            setattr(page, prefix, value)
+    return page
+
+
+async def _request_page(params, predicate=None, api_key=api_key):
+    query = dict(params, apikey=api_key)
+    session = get_session()
+    for attempt in range(RATE_LIMIT_RETRIES):
+        async with limiter, track_upstream('arbiscan', params.get('action')) as call:
+            async with session.get(ARBISCAN_API_URL, params=query) as response:
+                call.status = response.status
+                if response.status != 200:
+                    raise ArbiscanError(f"Failed to fetch data, status code: {response.status}")
+                try:
+                    page = await _read_page(response, predicate)
+                except aiohttp.ContentTypeError:
+                    raise ArbiscanError(f"Error decoding JSON for {params.get('action')}")
+                except Exception as e:
+                    if ijson is not None and isinstance(e, ijson.JSONError):
+                        raise ArbiscanError(f"Error decoding JSON for {params.get('action')}: {e}")
+                    raise
+            if isinstance(page.result, str) and 'rate limit' in page.result.lower():
+                call.status = 'rate_limited'
+
+        if call.status == 'rate_limited':
+            limiter.penalize(1)
+            await asyncio.sleep(2 ** attempt)
+            continue
+
+        if isinstance(page.result, list):
+            return page
+        if page.status == '0':
+            # "No transactions found" / "No records found" are empty pages, not errors.
+            if page.message.lower().startswith('no '):
+                page.result = page.rows
+                return page
+            raise ArbiscanError(f"{params.get('action')} failed: {page.message} {page.result}")
+        # proxy and stats actions answer with a scalar
+        return page
+
+    raise ArbiscanError(f"{params.get('action')} still rate limited after {RATE_LIMIT_RETRIES} attempts")
+
+
+async def arbiscan_request(params, api_key=api_key, predicate=None):
+    """Run one Arbiscan API call through the shared limiter and return its `result`.
+
+    For list actions only rows accepted by `predicate` are returned.
+    """
+    page = await _request_page(params, predicate, api_key)
+    return page.result
+
+
+async def get_latest_block(api_key=api_key):
+    result = await arbiscan_request({'module': 'proxy', 'action': 'eth_blockNumber'}, api_key)
+    return int(result, 16)
+
+
+def row_key(tx):
+    return tx['hash'], tx.get('from'), tx.get('to'), tx.get('value'), tx.get('logIndex')
+
+
+async def _scan_window(params, start_block, end_block, predicate, api_key):
+    page = await _request_page(dict(
+        params,
+        startblock=start_block,
+        endblock=end_block,
+        page=1,
+        offset=MAX_RESULTS_PER_PAGE,
+        sort='asc',
+    ), predicate, api_key)
+
+    if page.count < MAX_RESULTS_PER_PAGE:
+        return page.rows
+    if start_block == end_block:
+        logging.warning(f"Block {start_block} holds more than {MAX_RESULTS_PER_PAGE} rows, the rest are not reachable")
+        return page.rows
+
+    windows = split_range(start_block, end_block, SPLIT_FACTOR)
+    parts = await asyncio.gather(*(_scan_window(params, s, e, predicate, api_key) for s, e in windows))
+    return [tx for part in parts for tx in part]
+
+
+def split_range(start_block, end_block, parts):
+    size = max(1, (end_block - start_block + 1 + parts - 1) // parts)
+    windows = []
+    block = start_block
+    while block <= end_block:
+        windows.append((block, min(end_block, block + size - 1)))
+        block += size
+    return windows
+
+
+async def iter_scan(params, start_block=0, end_block=None, window=None, predicate=None, api_key=api_key):
+    """Yield every row of a paged Arbiscan list action between two blocks, oldest first.
+
+    The range is cut into block windows that are fetched concurrently. A window
+    that comes back full (Arbiscan stops at 10,000 rows) is split and fetched
+    again, so the result is never silently truncated. Responses are parsed as
+    they stream in and only rows accepted by `predicate` are kept. Rows are
+    yielded in block order and duplicates are dropped.
+    """
+    if end_block is None:
+        end_block = await get_latest_block(api_key)
+    if start_block > end_block:
+        return
+
+    if window:
+        windows = split_range(start_block, end_block, max(1, (end_block - start_block) // window + 1))
+    else:
+        windows = [(start_block, end_block)]
+
+    tasks = [asyncio.ensure_future(_scan_window(params, s, e, predicate, api_key)) for s, e in windows]
+    seen = set()
+    try:
+        for task in tasks:
+            for tx in await task:
+                key = row_key(tx)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield tx
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def scan(params, start_block=0, end_block=None, window=None, predicate=None, api_key=api_key):
+    return [tx async for tx in iter_scan(params, start_block, end_block, window, predicate, api_key)]
+
+
+async def iter_newest(params, start_block=None, end_block=None, page_size=100, api_key=api_key,
+                      max_page_size=None):
+    """Yield pages of a list action newest first, `page_size` rows at a time.
+
+    Meant for "latest N" lookups: the caller breaks out once it has enough,
+    so only the pages it needed are fetched. Arbiscan pages only reach the
+    first 10,000 rows of a query, so after that the query restarts below the
+    oldest block seen; rows of that block already yielded are skipped.
+
+    With `max_page_size` every further page is twice as large, up to that
+    size, so a sparse match is found in a logarithmic number of requests;
+    each larger page restarts below the oldest block seen the same way.
+    """
+    query = dict(params, sort='desc', offset=page_size)
+    if start_block is not None:
+        query['startblock'] = start_block
+    page_number = 1
+    # keys of the rows yielded from the oldest block seen so far
+    oldest, oldest_keys = None, set()
+    while True:
+        if end_block is not None:
+            query['endblock'] = end_block
+        rows = await arbiscan_request(dict(query, page=page_number), api_key)
+        fresh = [tx for tx in rows if int(tx['blockNumber']) != oldest or row_key(tx) not in oldest_keys]
+        for tx in fresh:
+            block = int(tx['blockNumber'])
+            if block != oldest:
+                oldest, oldest_keys = block, set()
+            oldest_keys.add(row_key(tx))
+        if fresh:
+            yield fresh
+        if len(rows) < page_size:
+            return
+
+        if max_page_size is not None and page_size < min(max_page_size, MAX_RESULTS_PER_PAGE):
+            page_size = min(page_size * 2, max_page_size, MAX_RESULTS_PER_PAGE)
+            query['offset'] = page_size
+            end_block = oldest
+            page_number = 1
+            continue
+        if (page_number + 1) * page_size <= MAX_RESULTS_PER_PAGE:
+            page_number += 1
+            continue
+        if end_block is not None and oldest >= end_block:
+            logging.warning(f"Block {oldest} holds more than {MAX_RESULTS_PER_PAGE} rows, the rest are not reachable")
+            return
+        end_block = oldest
+        page_number = 1
@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+
+from config import BLOCK_INDEX_GRANULARITY, api_key
+from .arbiscan import arbiscan_request
+
+MAX_INDEX_SIZE = 4096
+
+# (bucketed timestamp, closest) -> block number
+_block_index = OrderedDict()
+
+
+def _bucket(timestamp, closest):
+    timestamp = int(timestamp)
+    if closest == 'before':
+        return timestamp - timestamp % BLOCK_INDEX_GRANULARITY
+    return timestamp + (-timestamp) % BLOCK_INDEX_GRANULARITY
+
+
+async def block_by_time(timestamp, closest='before', api_key=api_key):
+    """Block number at `timestamp`, rounded outwards to the index granularity.
+
+    Rounding widens the span slightly but lets every query in the same
+    bucket reuse one `getblocknobytime` lookup.
+    """
+    key = (_bucket(timestamp, closest), closest)
+    if key in _block_index:
+        _block_index.move_to_end(key)
+        return _block_index[key]
+
+    result = await arbiscan_request({
+        'module': 'block',
+        'action': 'getblocknobytime',
+        'timestamp': key[0],
+        'closest': closest,
+    }, api_key)
+    block = int(result)
+
+    _block_index[key] = block
+    if len(_block_index) > MAX_INDEX_SIZE:
+        _block_index.popitem(last=False)
+    return block
+
+
+async def block_range(start_timestamp, end_timestamp, api_key=api_key):
+    """(start_block, end_block) covering the timestamps; end_block is None for "up to the latest block"."""
+    start_block = await block_by_time(start_timestamp, 'before', api_key)
+    if _bucket(end_timestamp, 'after') >= time.time():
+        return start_block, None
+    end_block = await block_by_time(end_timestamp, 'after', api_key)
+    return start_block, end_block
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound,
+                                TelegramRetryAfter, TelegramNetworkError, TelegramServerError)
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_COLLECTION
+from .db import get_collection
+from .metrics import broadcast_messages, broadcast_send_latency
+from .rate_limit import TokenBucket
+from .subscribers import subscribers
+
+MAX_ATTEMPTS = 3
+# Seconds before retrying a chat, times the attempt number. A broadcast sends
+# each chat one message, so retries are the only repeated sends into a chat
+# and this also keeps them under Telegram's one message per second per chat.
+RETRY_BACKOFF = 1.0
+
+DEAD_CHAT_ERRORS = ('chat not found', 'bot was blocked', 'user is deactivated', 'bot was kicked',
+                    'have no rights to send', 'group chat was upgraded')
+
+
+def is_dead_chat(error):
+    if isinstance(error, (TelegramForbiddenError, TelegramNotFound)):
+        return True
+    return isinstance(error, TelegramBadRequest) and any(text in str(error).lower() for text in DEAD_CHAT_ERRORS)
+
+
+class BroadcastResult:
+    __slots__ = ('sent', 'skipped', 'dead', 'failed', 'elapsed')
+
+    def __init__(self):
+        self.sent = 0
+        self.skipped = 0
+        self.dead = []
+        self.failed = []
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (f"BroadcastResult(sent={self.sent}, skipped={self.skipped}, dead={len(self.dead)}, "
+                f"failed={len(self.failed)}, elapsed={self.elapsed:.1f}s)")
+
+
+class _Checkpoint:
+    """Chat ids already served by one broadcast, persisted as each one is served."""
+
+    def __init__(self, broadcast_id):
+        self.broadcast_id = broadcast_id
+        self.done = set()
+
+    @property
+    def collection(self):
+        return get_collection(BROADCAST_COLLECTION)
+
+    async def load(self):
+        if self.broadcast_id is None:
+            return
+        # created up front, so a broadcast that dies before its first send still counts as unfinished
+        state = await self.collection.find_one_and_update(
+            {'_id': self.broadcast_id},
+            {'$setOnInsert': {'finished': False, 'sent': []}, '$set': {'updated_at': time.time()}},
+            projection={'sent': 1}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        self.done.update(state.get('sent', []))
+
+    async def mark(self, chat_id):
+        """Record a served chat before the worker moves on, so a restart sends it nothing again."""
+        self.done.add(chat_id)
+        if self.broadcast_id is None:
+            return
+        try:
+            await self.collection.update_one({'_id': self.broadcast_id},
+                                             {'$addToSet': {'sent': chat_id}, '$set': {'updated_at': time.time()}})
+        except PyMongoError as e:
+            logging.error(f"Could not checkpoint chat {chat_id} of broadcast {self.broadcast_id}: {e}")
+
+    async def finish(self, finished):
+        if self.broadcast_id is None:
+            return
+        await self.collection.update_one({'_id': self.broadcast_id},
+                                         {'$set': {'updated_at': time.time(), 'finished': finished}})
+
+
+async def is_unfinished(broadcast_id):
+    """True when a broadcast with this id started and did not run to the end."""
+    state = await get_collection(BROADCAST_COLLECTION).find_one({'_id': broadcast_id, 'finished': False}, {'_id': 1})
+    return state is not None
+
+
+async def remove_dead_chats(chat_ids):
+    if chat_ids:
+        await subscribers.discard_many(chat_ids)
+        await subscribers.flush()
+
+
+async def broadcast(chat_ids, send, broadcast_id=None, rate=BROADCAST_RATE, concurrency=BROADCAST_CONCURRENCY,
+                    remove_dead=True):
+    """Deliver `send(chat_id)` to every chat concurrently within Telegram's limits.
+
+    `chat_ids` may be a plain iterable or an async iterable such as the
+    subscriber registry; it is consumed lazily through a bounded queue.
+
+    A global token bucket keeps the send rate under `rate` messages per second
+    and `RetryAfter` answers pause every worker, not only the one that got it.
+    Chats that no longer exist are collected and removed in one bulk write.
+    With a `broadcast_id`, delivered chats are checkpointed so a restarted
+    broadcast skips them instead of sending duplicates.
+    """
+    result = BroadcastResult()
+    started = time.monotonic()
+    limiter = TokenBucket(rate)
+    checkpoint = _Checkpoint(broadcast_id)
+    await checkpoint.load()
+
+    workers = max(1, concurrency)
+    queue = asyncio.Queue(maxsize=workers * 4)
+
+    async def produce():
+        if hasattr(chat_ids, '__aiter__'):
+            async for chat_id in chat_ids:
+                await enqueue(chat_id)
+        else:
+            for chat_id in chat_ids:
+                await enqueue(chat_id)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def enqueue(chat_id):
+        if chat_id in checkpoint.done:
+            result.skipped += 1
+            broadcast_messages.inc('skipped')
+        else:
+            await queue.put(chat_id)
+
+    async def timed_send(chat_id):
+        sending = time.monotonic()
+        try:
+            await send(chat_id)
+        finally:
+            broadcast_send_latency.observe(time.monotonic() - sending)
+
+    async def deliver(chat_id):
+        for attempt in range(MAX_ATTEMPTS):
+            await limiter.acquire()
+            try:
+                await timed_send(chat_id)
+                return True
+            except TelegramRetryAfter as e:
+                broadcast_messages.inc('flood_wait')
+                logging.warning(f"Flood limit hit, pausing broadcast for {e.retry_after}s")
+                limiter.penalize(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                broadcast_messages.inc('retried')
+                logging.warning(f"Retrying chat {chat_id} after error: {e}")
+                await asyncio.sleep(RETRY_BACKOFF * (attempt + 1))
+        return False
+
+    async def worker():
+        while True:
+            chat_id = await queue.get()
+            if chat_id is None:
+                return
+            try:
+                if await deliver(chat_id):
+                    result.sent += 1
+                    broadcast_messages.inc('sent')
+                    await checkpoint.mark(chat_id)
+                else:
+                    result.failed.append(chat_id)
+                    broadcast_messages.inc('failed')
+            except Exception as e:
+                if is_dead_chat(e):
+                    result.dead.append(chat_id)
+                    broadcast_messages.inc('dead')
+                    await checkpoint.mark(chat_id)
+                else:
+                    logging.error(f"Failed to send message to chat {chat_id}: {e}")
+                    result.failed.append(chat_id)
+                    broadcast_messages.inc('failed')
+
+    completed = False
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(worker()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+        completed = True
+    finally:
+        # when one side dies the other would wait on the queue forever
+        for task in tasks:
+            task.cancel()
+        await checkpoint.finish(completed)
+
+    if remove_dead:
+        await remove_dead_chats(result.dead)
+
+    result.elapsed = time.monotonic() - started
+    return result
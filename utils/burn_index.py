@@ -0,0 +1,133 @@
+import asyncio
+import bisect
+import logging
+import time
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from config import BURN_INDEX_REFRESH, LEDGER_COLLECTION
+from .db import get_collection
+from .decode import TransferColumns
+from .ledger import ensure_ledger_indexes, sync_burn_ledger
+
+LOAD_BATCH_SIZE = 5000
+
+
+class BurnIndex:
+    """Burn transfers of one contract in timestamp order with running totals.
+
+    `cumulative[i]` is the sum of the first `i` amounts, so the total of any
+    window is two bisects and a subtraction. Queries only read memory;
+    `refresh()` syncs the ledger and appends the rows it has not seen yet.
+    """
+
+    def __init__(self, contract_address):
+        self.contract_address = contract_address.lower()
+        self.transfers = TransferColumns()
+        self.cumulative = [0]
+        self.refreshed_at = 0.0
+        # rows already indexed at the newest timestamp, to skip them when re-reading it
+        self._boundary = set()
+        self._lock = None
+
+    def __len__(self):
+        return len(self.transfers)
+
+    def _bounds(self, start=None, end=None):
+        timestamps = self.transfers.timestamps
+        lo = 0 if start is None else bisect.bisect_left(timestamps, int(start))
+        hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, int(end))
+        return lo, max(lo, hi)
+
+    def total(self, start=None, end=None):
+        """Burned base units with `start <= timeStamp <= end`."""
+        lo, hi = self._bounds(start, end)
+        return self.cumulative[hi] - self.cumulative[lo]
+
+    def count(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+    def rows(self, start=None, end=None, last_n=None):
+        """(recipient, amount, timestamp, sender, hash) in the window, oldest first; `last_n` keeps the newest."""
+        lo, hi = self._bounds(start, end)
+        if last_n is not None:
+            lo = max(lo, hi - last_n)
+        columns = self.transfers
+        return list(zip(columns.recipients[lo:hi], columns.amounts[lo:hi], columns.timestamps[lo:hi],
+                        columns.senders[lo:hi], columns.hashes[lo:hi]))
+
+    def extend(self, entries):
+        """Append ledger entries sorted by `timeStamp` and not older than the newest indexed one."""
+        columns = self.transfers
+        running = self.cumulative[-1]
+        for entry in entries:
+            timestamp = entry['timeStamp']
+            # same identity as the ledger's unique index
+            key = (entry['hash'], entry['from'], entry['to'], str(entry['value']), entry.get('logIndex'))
+            if columns.timestamps and timestamp == columns.timestamps[-1]:
+                if key in self._boundary:
+                    continue
+            else:
+                self._boundary = set()
+            self._boundary.add(key)
+            amount = int(entry['value'])
+            columns.append(entry['to'], amount, timestamp, entry['from'], entry['hash'])
+            running += amount
+            self.cumulative.append(running)
+
+    async def _load(self):
+        await ensure_ledger_indexes()
+        query = {'contract': self.contract_address}
+        if self.transfers.timestamps:
+            query['timeStamp'] = {'$gte': self.transfers.timestamps[-1]}
+        cursor = get_collection(LEDGER_COLLECTION).find(
+            query, {'_id': 0, 'hash': 1, 'from': 1, 'to': 1, 'value': 1, 'logIndex': 1, 'timeStamp': 1},
+            batch_size=LOAD_BATCH_SIZE
+        ).sort('timeStamp', ASCENDING)
+        batch = []
+        async for entry in cursor:
+            batch.append(entry)
+            if len(batch) >= LOAD_BATCH_SIZE:
+                self.extend(batch)
+                batch = []
+        self.extend(batch)
+
+    async def refresh(self, sync=True):
+        """Sync the ledger and append what is new; concurrent callers share one refresh."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if self._lock.locked():
+            async with self._lock:
+                return self
+        async with self._lock:
+            try:
+                if sync:
+                    await sync_burn_ledger(self.contract_address)
+                await self._load()
+            except PyMongoError as e:
+                logging.error(f"Could not load burn index of {self.contract_address}: {e}")
+                return self
+            self.refreshed_at = time.monotonic()
+        return self
+
+
+_indexes = {}
+
+
+async def get_burn_index(contract_address, max_age=BURN_INDEX_REFRESH):
+    """The burn index of a contract, built on first use.
+
+    Once built it is returned at once; when older than `max_age` it is
+    refreshed in the background, so queries never wait on upstreams.
+    """
+    key = contract_address.lower()
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = BurnIndex(key)
+    if not index.refreshed_at:
+        return await index.refresh()
+    if time.monotonic() - index.refreshed_at > max_age and not index._lock.locked():
+        asyncio.ensure_future(index.refresh())
+    return index
@@ -0,0 +1,80 @@
+import asyncio
+import functools
+import inspect
+import time
+from collections import OrderedDict
+
+# name -> stats dict of every cached function, read by monitoring code
+cache_stats = {}
+
+
+def async_cached(ttl, maxsize=128, key=None):
+    """Memoize a coroutine function with a TTL, LRU eviction and single-flight calls.
+
+    Concurrent calls with the same arguments share one in-flight upstream call
+    instead of each starting their own. Only successful results are cached.
+    Cached values are shared between callers, so they must not be mutated.
+
+    `key` maps the call arguments to a cache key when the arguments themselves
+    are not hashable or not a good identity (e.g. a contract object).
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        entries = OrderedDict()
+        in_flight = {}
+        stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+        cache_stats[f"{func.__module__}.{func.__qualname__}"] = stats
+
+        def make_key(args, kwargs):
+            if key is not None:
+                return key(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple(bound.arguments.items())
+
+        def store(cache_key, task):
+            in_flight.pop(cache_key, None)
+            if task.cancelled() or task.exception() is not None:
+                return
+            entries[cache_key] = (time.monotonic() + ttl, task.result())
+            entries.move_to_end(cache_key)
+            while len(entries) > maxsize:
+                entries.popitem(last=False)
+                stats['evictions'] += 1
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = make_key(args, kwargs)
+
+            entry = entries.get(cache_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    entries.move_to_end(cache_key)
+                    stats['hits'] += 1
+                    return entry[1]
+                del entries[cache_key]
+
+            task = in_flight.get(cache_key)
+            if task is not None:
+                stats['coalesced'] += 1
+            else:
+                stats['misses'] += 1
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                in_flight[cache_key] = task
+                task.add_done_callback(functools.partial(store, cache_key))
+
+            # A caller that gives up must not cancel the call others are waiting on.
+            return await asyncio.shield(task)
+
+        def cache_info():
+            return dict(stats, size=len(entries), in_flight=len(in_flight))
+
+        def cache_clear():
+            entries.clear()
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,112 @@
+import itertools
+
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+
+from config import ARBITRUM_RPC_URL as RPC_URL, CONTRACT_ADDRESS, get_contract_abi
+from .http_client import get_session
+from .metrics import track_upstream
+
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+# aggregate3((address target, bool allowFailure, bytes callData)[])
+AGGREGATE3_SELECTOR = '0x82ad56cb'
+
+_w3 = None
+_contracts = {}
+_request_ids = itertools.count(1)
+
+
+class RPCError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def get_w3():
+    global _w3
+    if _w3 is None:
+        # web3 takes about a second to import, so it is loaded with the first client
+        from web3 import AsyncWeb3
+        _w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(RPC_URL))
+    return _w3
+
+
+def get_contract(address=CONTRACT_ADDRESS, abi=None):
+    address = to_checksum_address(address)
+    if address not in _contracts:
+        _contracts[address] = get_w3().eth.contract(address=address, abi=abi or get_contract_abi())
+    return _contracts[address]
+
+
+async def start_chain():
+    """Point the provider at the shared HTTP pool so RPC calls reuse its connections."""
+    await get_w3().provider.cache_async_session(get_session())
+
+
+async def rpc_batch(calls, return_errors=False):
+    """Send several JSON-RPC calls as one batch request.
+
+    `calls` is a list of `(method, params)`; results come back in the same
+    order. A failed call raises `RPCError`, or is returned in its slot when
+    `return_errors` is set.
+    """
+    payload = [{'jsonrpc': '2.0', 'id': next(_request_ids), 'method': method, 'params': params}
+               for method, params in calls]
+    if not payload:
+        return []
+
+    methods = {method for method, _ in calls}
+    session = get_session()
+    async with track_upstream('rpc', methods.pop() if len(methods) == 1 else 'batch') as call:
+        async with session.post(RPC_URL, json=payload) as response:
+            call.status = response.status
+            if response.status != 200:
+                raise RPCError(f"RPC request failed, status code: {response.status}", response.status)
+            data = await response.json(content_type=None)
+
+    if isinstance(data, dict):
+        # Some providers answer a rejected batch with a single error object.
+        error = data.get('error') or {}
+        raise RPCError(error.get('message', str(data)), error.get('code'))
+
+    by_id = {item.get('id'): item for item in data}
+    results = []
+    for request in payload:
+        item = by_id.get(request['id'])
+        if item is None:
+            error = RPCError(f"No response for {request['method']}")
+        elif 'error' in item:
+            error = RPCError(item['error'].get('message', ''), item['error'].get('code'))
+        else:
+            results.append(item.get('result'))
+            continue
+        if not return_errors:
+            raise error
+        results.append(error)
+    return results
+
+
+async def rpc_call(method, params):
+    return (await rpc_batch([(method, params)]))[0]
+
+
+def decode_output(function, data):
+    output_types = [output['type'] for output in function.abi['outputs']]
+    values = get_w3().codec.decode(output_types, HexBytes(data))
+    return values[0] if len(values) == 1 else values
+
+
+async def multicall(functions, block='latest', allow_failure=False):
+    """Run several bound contract calls inside a single `eth_call` to Multicall3.
+
+    Every read, e.g. `contract.functions.balanceOf(a)`, comes from the same
+    block. Failed calls are returned as None when `allow_failure` is set.
+    """
+    codec = get_w3().codec
+    calls = [(function.address, allow_failure, HexBytes(function._encode_transaction_data()))
+             for function in functions]
+    data = AGGREGATE3_SELECTOR + codec.encode(['(address,bool,bytes)[]'], [calls]).hex()
+    result = await rpc_call('eth_call', [{'to': MULTICALL3_ADDRESS, 'data': data}, block])
+    (returned,) = codec.decode(['(bool,bytes)[]'], HexBytes(result))
+    return [decode_output(function, output) if success else None
+            for function, (success, output) in zip(functions, returned)]
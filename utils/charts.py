@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# matplotlib is optional and only imported by the worker processes that draw
+CHARTS_AVAILABLE = importlib.util.find_spec('matplotlib') is not None
+
+from aiogram.types import BufferedInputFile
+
+from config import CHART_WORKERS, CHART_CACHE_SIZE, REPORT_PHOTO
+
+_executor = None
+_charts = OrderedDict()
+_rendering = {}
+
+
+def render_weekly_chart(data):
+    """PNG bytes of a weekly chart; runs in a worker process."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+
+    days = [datetime.utcfromtimestamp(day).strftime('%m-%d') for day in data['days']]
+    figure, burned_axis = pyplot.subplots(figsize=(8, 4.5), dpi=100)
+    try:
+        burned_axis.bar(days, data['burned'], color='#e4572e', label='Burned')
+        burned_axis.set_ylabel('Burned per day')
+        supply_axis = burned_axis.twinx()
+        supply_axis.plot(days, data['supply'], color='#17bebb', marker='o', label='Supply')
+        supply_axis.set_ylabel('Supply')
+        supply_axis.ticklabel_format(axis='y', style='plain', useOffset=False)
+
+        title = f"{data['symbol']} — last {len(days)} days"
+        if data['price_usd'] is not None:
+            title += f"  |  price ${data['price_usd']:.8g}"
+        burned_axis.set_title(title)
+        handles = burned_axis.get_legend_handles_labels()
+        supply_handles = supply_axis.get_legend_handles_labels()
+        figure.legend(handles[0] + supply_handles[0], handles[1] + supply_handles[1], loc='lower center', ncol=2,
+                      frameon=False)
+        figure.tight_layout(rect=(0, 0.06, 1, 1))
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+    finally:
+        pyplot.close(figure)
+
+
+def weekly_chart_data(token, stats):
+    """What the chart of `stats` shows; None when the snapshot has no daily series yet."""
+    daily = stats.get('daily_burned')
+    if not daily:
+        return None
+    # supply at the end of each day is today's supply plus everything burned after that day
+    supply = []
+    burned_after = 0
+    for burned in reversed(daily['burned']):
+        supply.append(stats['current_supply'] + burned_after)
+        burned_after += burned
+    supply.reverse()
+    return {
+        'symbol': token.symbol,
+        'days': daily['days'],
+        'burned': daily['burned'],
+        'supply': supply,
+        'price_usd': stats['price_usd'],
+    }
+
+
+class Chart:
+    """A rendered PNG and, once Telegram has stored it, its `file_id`."""
+
+    def __init__(self, key, png):
+        self.key = key
+        self.png = png
+        self.file_id = None
+        self._upload_lock = asyncio.Lock()
+
+    async def send(self, send_photo, remember=True):
+        """Return `await send_photo(photo)`.
+
+        The first successful send uploads the PNG. Every later one passes the
+        returned `file_id`, so Telegram does not receive the image again.
+        Sends through a different bot, such as a dry run, pass
+        `remember=False`, since file ids are only valid for the bot that
+        uploaded the file.
+        """
+        if not remember:
+            return await send_photo(self.upload())
+        if self.file_id is None:
+            async with self._upload_lock:
+                if self.file_id is None:
+                    message = await send_photo(self.upload())
+                    if getattr(message, 'photo', None):
+                        self.file_id = message.photo[-1].file_id
+                    return message
+        return await send_photo(self.file_id)
+
+    def upload(self):
+        return BufferedInputFile(self.png, filename=f"chart-{self.key[:12]}.png")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawned workers: forking a process that runs the event loop and driver threads is unsafe
+        _executor = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+async def _render(key, data):
+    try:
+        png = await asyncio.get_running_loop().run_in_executor(_get_executor(), render_weekly_chart, data)
+    except Exception as e:
+        logging.error(f"Failed to render chart: {e}")
+        return None
+    chart = _charts[key] = Chart(key, png)
+    while len(_charts) > CHART_CACHE_SIZE:
+        _charts.popitem(last=False)
+    return chart
+
+
+async def weekly_chart(token, stats):
+    """The cached `Chart` of a weekly report, rendered on first use; None when charts are unavailable."""
+    if not CHARTS_AVAILABLE:
+        return None
+    data = weekly_chart_data(token, stats)
+    if data is None:
+        return None
+    key = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    chart = _charts.get(key)
+    if chart is not None:
+        _charts.move_to_end(key)
+        return chart
+    task = _rendering.get(key)
+    if task is None:
+        task = _rendering[key] = asyncio.ensure_future(_render(key, data))
+        task.add_done_callback(lambda _: _rendering.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def send_chart(chart, send_photo, remember=True):
+    """Send `chart` through `send_photo(photo)`, or the static `REPORT_PHOTO` when there is no chart."""
+    if chart is None:
+        return await send_photo(REPORT_PHOTO)
+    return await chart.send(send_photo, remember)
+
+
+def close_charts():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,157 @@
+import asyncio
+import functools
+import logging
+import time
+from datetime import datetime, timedelta
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from config import INSTANCE_ID, LEADER_LEASE_TTL, LEASE_COLLECTION, FSM_COLLECTION
+from .db import get_collection
+
+
+class LeaderLease:
+    """Lease-based leader election over a Mongo document.
+
+    The holder renews the lease every `ttl / 3` seconds; anyone may take it
+    over once it has expired. `is_leader` turns false as soon as the lease
+    could have expired locally, so two instances never both believe they
+    lead even when renewals fail.
+    """
+
+    def __init__(self, name, ttl=LEADER_LEASE_TTL, instance_id=INSTANCE_ID):
+        self.name = name
+        self.ttl = ttl
+        self.instance_id = instance_id
+        self._valid_until = 0.0
+        self._task = None
+        self._on_acquire = []
+
+    def on_acquire(self, func):
+        """Register a coroutine function started each time this instance becomes the leader."""
+        self._on_acquire.append(func)
+        return func
+
+    @property
+    def collection(self):
+        return get_collection(LEASE_COLLECTION)
+
+    @property
+    def is_leader(self):
+        return time.monotonic() < self._valid_until
+
+    async def try_acquire(self):
+        started = time.monotonic()
+        now = datetime.utcnow()
+        try:
+            lease = await self.collection.find_one_and_update(
+                {'_id': self.name, '$or': [{'holder': self.instance_id}, {'expires_at': {'$lt': now}}]},
+                {'$set': {'holder': self.instance_id, 'expires_at': now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # the lease exists and is held by someone else
+            lease = None
+        except PyMongoError as e:
+            logging.error(f"Could not renew lease {self.name}: {e}")
+            lease = None
+
+        was_leader = self.is_leader
+        if lease is not None and lease['holder'] == self.instance_id:
+            # count from before the request so the local view expires no later than Mongo's
+            self._valid_until = started + self.ttl
+        else:
+            self._valid_until = 0.0
+        if self.is_leader != was_leader:
+            logging.info(f"{self.instance_id} {'acquired' if self.is_leader else 'lost'} lease {self.name}")
+            if self.is_leader:
+                for func in self._on_acquire:
+                    asyncio.ensure_future(func())
+        return self.is_leader
+
+    async def _renew_periodically(self):
+        while True:
+            await self.try_acquire()
+            await asyncio.sleep(self.ttl / 3)
+
+    async def start(self):
+        await self.try_acquire()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._renew_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            self._valid_until = 0.0
+            try:
+                await self.collection.delete_one({'_id': self.name, 'holder': self.instance_id})
+            except PyMongoError as e:
+                logging.error(f"Could not release lease {self.name}: {e}")
+
+
+def leader_only(lease):
+    """Decorator for scheduled jobs that must run once per cluster, on the lease holder."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not lease.is_leader:
+                logging.info(f"Skipping {func.__name__}: {lease.instance_id} does not hold lease {lease.name}")
+                return None
+            return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MongoStorage(BaseStorage):
+    """aiogram FSM storage shared by every replica through Mongo.
+
+    One document per storage key holds the state and the data dict.
+    """
+
+    def __init__(self, collection=FSM_COLLECTION):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        return get_collection(self._collection)
+
+    @staticmethod
+    def _key(key):
+        return ':'.join(str(part) for part in (key.bot_id, key.chat_id, key.user_id, key.thread_id,
+                                                key.business_connection_id, key.destiny))
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        if state is None:
+            await self.collection.update_one({'_id': self._key(key)}, {'$unset': {'state': ''}})
+        else:
+            await self.collection.update_one({'_id': self._key(key)},
+                                             {'$set': {'state': state, 'updated_at': datetime.utcnow()}},
+                                             upsert=True)
+
+    async def get_state(self, key):
+        document = await self.collection.find_one({'_id': self._key(key)}, {'state': 1})
+        return document.get('state') if document else None
+
+    async def set_data(self, key, data):
+        if not data:
+            await self.collection.update_one({'_id': self._key(key)}, {'$unset': {'data': ''}})
+        else:
+            await self.collection.update_one({'_id': self._key(key)},
+                                             {'$set': {'data': dict(data), 'updated_at': datetime.utcnow()}},
+                                             upsert=True)
+
+    async def get_data(self, key):
+        document = await self.collection.find_one({'_id': self._key(key)}, {'data': 1})
+        return dict(document.get('data') or {}) if document else {}
+
+    async def close(self):
+        # the client is shared and closed by main through utils.db.close_db
+        pass
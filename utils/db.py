@@ -0,0 +1,30 @@
+import motor.motor_asyncio
+
+from config import MONGO_URI, MONGO_DB_NAME
+from .metrics import MongoCommandMetrics
+
+_client = None
+
+
+def get_client():
+    """Shared Motor client, created on first use.
+
+    Creating it resolves `mongodb+srv` hosts, so it is kept out of import
+    time; `main.main()` closes it through `close_db`.
+    """
+    global _client
+    if _client is None:
+        _client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI, tlsAllowInvalidCertificates=True,
+                                                          event_listeners=[MongoCommandMetrics()])
+    return _client
+
+
+def get_collection(name):
+    return get_client()[MONGO_DB_NAME][name]
+
+
+def close_db():
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = None
@@ -0,0 +1,70 @@
+from array import array
+
+TRANSFER_SELECTOR = '0xa9059cbb'
+# selector + padded address + uint256 amount
+TRANSFER_INPUT_LENGTH = 10 + 64 + 64
+
+
+class TransferColumns:
+    """Decoded ERC-20 transfers stored column-wise.
+
+    Amounts are exact integers in base units; divide by 10 ** decimals only
+    when formatting.
+    """
+    __slots__ = ('recipients', 'amounts', 'timestamps', 'senders', 'hashes')
+
+    def __init__(self):
+        self.recipients = []
+        self.amounts = []
+        self.timestamps = array('q')
+        self.senders = []
+        self.hashes = []
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def append(self, recipient, amount, timestamp, sender, tx_hash):
+        self.recipients.append(recipient)
+        self.amounts.append(amount)
+        self.timestamps.append(timestamp)
+        self.senders.append(sender)
+        self.hashes.append(tx_hash)
+
+    def total(self):
+        return sum(self.amounts)
+
+    def rows(self):
+        """(recipient, amount, timestamp, sender, hash) per transfer."""
+        return zip(self.recipients, self.amounts, self.timestamps, self.senders, self.hashes)
+
+
+def decode_transfers(transactions, recipients=None):
+    """Decode a batch of transactions into `TransferColumns`.
+
+    Accepts Arbiscan `txlist` rows, whose `transfer(to, amount)` calldata is
+    decoded, and `tokentx` / ledger rows, which already carry `to` and
+    `value`. Anything else is skipped. When `recipients` is given only
+    transfers into those addresses are kept.
+    """
+    if recipients is not None:
+        recipients = {address.lower() for address in recipients}
+
+    columns = TransferColumns()
+    for tx in transactions:
+        input_data = tx.get('input')
+        if input_data is None or input_data == 'deprecated':
+            # tokentx / ledger rows: the transfer is already decoded
+            recipient = tx['to'].lower()
+            amount = int(str(tx['value']))
+        elif input_data.startswith(TRANSFER_SELECTOR):
+            if len(input_data) < TRANSFER_INPUT_LENGTH:
+                continue
+            recipient = '0x' + input_data[34:74].lower()
+            amount = int(input_data[74:TRANSFER_INPUT_LENGTH], 16)
+        else:
+            continue
+
+        if recipients is not None and recipient not in recipients:
+            continue
+        columns.append(recipient, amount, int(tx['timeStamp']), tx['from'], tx['hash'])
+    return columns
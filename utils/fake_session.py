@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+import json
+import time
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import InputFile
+
+
+class RecordingSession(BaseSession):
+    """aiogram session that records outgoing API calls instead of contacting Telegram.
+
+    Every call is appended to `calls` as `(api_method, params, timestamp)` and
+    answered with a minimal valid response. `responder(method)` may return a
+    `(status_code, payload)` tuple to simulate errors such as 429 or 403;
+    returning None falls back to the default answer. With `read_uploads`,
+    uploaded files are read to the end like a real session would, and their
+    size is added to `uploaded_bytes`.
+    """
+
+    def __init__(self, responder=None, latency=0.0, read_uploads=False, **kwargs):
+        super().__init__(**kwargs)
+        self.responder = responder
+        self.latency = latency
+        self.read_uploads = read_uploads
+        self.uploaded_bytes = 0
+        self.calls = []
+        self._ids = itertools.count(1)
+
+    def _default_result(self, method):
+        returning = str(method.__returning__)
+        chat_id = getattr(method, 'chat_id', None)
+        if 'Message' in returning and chat_id is not None:
+            message_id = next(self._ids)
+            result = {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+            }
+            if method.__api_method__ == 'sendPhoto':
+                result['photo'] = [{
+                    'file_id': f"fake-photo-{message_id}",
+                    'file_unique_id': f"fake-unique-{message_id}",
+                    'width': 1,
+                    'height': 1,
+                }]
+            return result
+        if 'User' in returning:
+            return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+        return True
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append((method.__api_method__, method.model_dump(exclude_none=True), time.monotonic()))
+        if self.read_uploads:
+            files = {}
+            self.prepare_value(method.model_dump(warnings=False), bot=bot, files=files)
+            for value in files.values():
+                if isinstance(value, InputFile):
+                    async for chunk in value.read(bot):
+                        self.uploaded_bytes += len(chunk)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        answer = self.responder(method) if self.responder is not None else None
+        if answer is None:
+            answer = (200, {'ok': True, 'result': self._default_result(method)})
+        status_code, payload = answer
+
+        response = self.check_response(bot=bot, method=method, status_code=status_code,
+                                       content=json.dumps(payload))
+        return response.result
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+    def count(self, api_method=None):
+        if api_method is None:
+            return len(self.calls)
+        return sum(1 for call in self.calls if call[0] == api_method)
+
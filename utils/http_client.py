@@ -0,0 +1,45 @@
+import ssl
+
+import aiohttp
+
+from config import (HTTP_TOTAL_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_POOL_LIMIT, HTTP_LIMIT_PER_HOST,
+                    HTTP_KEEPALIVE_TIMEOUT, HTTP_DNS_TTL)
+
+_session = None
+
+
+def _create_session():
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        ssl=ssl.create_default_context(),
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def get_session():
+    """Shared keep-alive session for upstream calls.
+
+    Callers borrow it and must not close it; `main.main()` owns its lifetime
+    through `start_http_client` / `close_http_client`. Scripts that never
+    call those still get a session on first use.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+async def start_http_client():
+    return get_session()
+
+
+async def close_http_client():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+
+import aiohttp
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+from config import CONTRACT_ADDRESS, LEDGER_SOURCE, LOG_START_BLOCK, LEDGER_COLLECTION, SYNC_COLLECTION, api_key
+from .arbiscan import ArbiscanError, get_latest_block, scan
+from .chain import RPCError
+from .db import get_collection
+from .log_indexer import fetch_burn_logs, get_chain_head
+from .rate_limit import rate_key
+
+BURN_ADDRESSES = [
+    '0x000000000000000000000000000000000000dEaD',
+    '0x0000000000000000000000000000000000000000'
+]
+
+SUM_BATCH_SIZE = 10000
+LEGACY_UNIQUE_INDEX = 'contract_1_hash_1_from_1_to_1_value_1'
+
+_sync_locks = {}
+_indexes_ready = False
+
+
+def _cursor_id(contract_address):
+    return f"burns:{contract_address.lower()}"
+
+
+def _sync_lock(contract_address):
+    key = contract_address.lower()
+    if key not in _sync_locks:
+        _sync_locks[key] = asyncio.Lock()
+    return _sync_locks[key]
+
+
+async def ensure_ledger_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    collection = get_collection(LEDGER_COLLECTION)
+    # values used to be Decimal128, which holds only 34 digits; they are exact decimal strings now
+    await collection.update_many({'value': {'$type': 'decimal'}}, [{'$set': {'value': {'$toString': '$value'}}}])
+    # logIndex tells apart equal transfers in one transaction; Arbiscan rows have none and index as null
+    await collection.create_index(
+        [('contract', ASCENDING), ('hash', ASCENDING), ('from', ASCENDING), ('to', ASCENDING), ('value', ASCENDING),
+         ('logIndex', ASCENDING)],
+        unique=True
+    )
+    try:
+        # the previous unique index, without logIndex, would still reject them
+        await collection.drop_index(LEGACY_UNIQUE_INDEX)
+    except OperationFailure:
+        pass
+    await collection.create_index([('contract', ASCENDING), ('timeStamp', ASCENDING)])
+    _indexes_ready = True
+
+
+def ledger_entry(contract_address, tx):
+    entry = {
+        'contract': contract_address.lower(),
+        'hash': tx['hash'],
+        'blockNumber': int(tx['blockNumber']),
+        'timeStamp': int(tx['timeStamp']),
+        'from': tx['from'].lower(),
+        'to': tx['to'].lower(),
+        # a uint256 can have 78 digits, so the exact decimal string is stored
+        'value': str(int(tx['value'])),
+    }
+    if 'logIndex' in tx:
+        entry['logIndex'] = int(tx['logIndex'])
+    return entry
+
+
+async def store_burn_transfers(contract_address, transactions):
+    if not transactions:
+        return 0
+    operations = []
+    for tx in transactions:
+        entry = ledger_entry(contract_address, tx)
+        key = {field: entry[field] for field in ('contract', 'hash', 'from', 'to', 'value')}
+        key['logIndex'] = entry.get('logIndex')
+        operations.append(UpdateOne(key, {'$setOnInsert': entry}, upsert=True))
+    result = await get_collection(LEDGER_COLLECTION).bulk_write(operations, ordered=False)
+    return result.upserted_count
+
+
+async def _fetch_burn_transfers(contract_address, burn_address, start_block, end_block, api_key):
+    burn_address = burn_address.lower()
+    return await scan({
+        'module': 'account',
+        'action': 'tokentx',
+        'contractaddress': contract_address,
+        'address': burn_address,
+    }, start_block, end_block, predicate=lambda tx: tx['to'].lower() == burn_address, api_key=api_key)
+
+
+async def _save_cursor(contract_address, last_block, **extra):
+    await get_collection(SYNC_COLLECTION).update_one(
+        {'_id': _cursor_id(contract_address)},
+        {'$max': {'last_block': last_block}, '$set': extra} if extra else {'$max': {'last_block': last_block}},
+        upsert=True
+    )
+
+
+async def _sync_from_arbiscan(contract_address, start_block, api_key):
+    end_block = await get_latest_block(api_key)
+    results = await asyncio.gather(*(
+        _fetch_burn_transfers(contract_address, burn_address, start_block, end_block, api_key)
+        for burn_address in BURN_ADDRESSES
+    ))
+    transfers = [tx for rows in results for tx in rows]
+    await store_burn_transfers(contract_address, transfers)
+    # Arbiscan's account index trails the node head, so the cursor only moves
+    # to the newest block actually returned; blocks between that and the head
+    # may still be indexed later and are scanned again next time.
+    if transfers:
+        await _save_cursor(contract_address, max(int(tx['blockNumber']) for tx in transfers))
+    return len(transfers)
+
+
+async def _sync_from_logs(contract_address, start_block, state):
+    stored = 0
+
+    async def on_chunk(transfers, last_block):
+        nonlocal stored
+        stored += len(transfers)
+        await store_burn_transfers(contract_address, transfers)
+        await _save_cursor(contract_address, last_block)
+
+    end_block = await get_chain_head()
+    chunk_size = await fetch_burn_logs(contract_address, BURN_ADDRESSES, max(start_block, LOG_START_BLOCK), end_block,
+                                       on_chunk, chunk_size=state.get('chunk_size'))
+    await _save_cursor(contract_address, end_block, chunk_size=chunk_size)
+    return stored
+
+
+async def sync_burn_ledger(contract_address=CONTRACT_ADDRESS, api_key=api_key):
+    """Pull burn transfers newer than the stored cursor into the ledger."""
+    # Arbiscan requests made for this sync share the quota fairly with other contracts.
+    key = rate_key.set(contract_address.lower())
+    try:
+        return await _sync_burn_ledger(contract_address, api_key)
+    finally:
+        rate_key.reset(key)
+
+
+async def _sync_burn_ledger(contract_address, api_key):
+    async with _sync_lock(contract_address):
+        await ensure_ledger_indexes()
+        state = await get_collection(SYNC_COLLECTION).find_one({'_id': _cursor_id(contract_address)}) or {}
+        last_block = state.get('last_block', 0)
+
+        # On failure the cursor stays at the last stored block, so the next
+        # call picks up from there.
+        try:
+            if LEDGER_SOURCE == 'logs':
+                return await _sync_from_logs(contract_address, last_block + 1, state)
+            # the cursor block is read again in case Arbiscan had only part of
+            # it; the ledger's unique index drops the repeats
+            return await _sync_from_arbiscan(contract_address, last_block, api_key)
+        except (ArbiscanError, RPCError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Failed to sync burn ledger of {contract_address}: {e}")
+            return 0
+
+
+async def burned_total(contract_address=CONTRACT_ADDRESS, since=None, until=None):
+    """Sum of burned base units in the ledger, optionally limited to a unix timestamp window."""
+    match = {'contract': contract_address.lower()}
+    window = {}
+    if since is not None:
+        window['$gte'] = int(since)
+    if until is not None:
+        window['$lte'] = int(until)
+    if window:
+        match['timeStamp'] = window
+
+    # summed here rather than with $group, which would round past 34 digits
+    total = 0
+    cursor = get_collection(LEDGER_COLLECTION).find(match, {'_id': 0, 'value': 1}, batch_size=SUM_BATCH_SIZE)
+    async for entry in cursor:
+        total += int(entry['value'])
+    return total
@@ -0,0 +1,123 @@
+import asyncio
+from collections import OrderedDict
+
+from config import LOG_CHUNK_SIZE, LOG_MAX_CHUNK_SIZE, LOG_CHUNK_CONCURRENCY
+from .chain import RPCError, rpc_batch, rpc_call
+
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+BLOCK_BATCH_SIZE = 100
+MAX_TIMESTAMP_CACHE = 10000
+
+# Phrases providers use when a getLogs range returns too many results.
+TOO_MANY_RESULTS = ('more than', 'too many', 'limit exceeded', 'query returned', 'range is too large',
+                    'response size', 'block range')
+
+_block_timestamps = OrderedDict()
+
+
+def address_topic(address):
+    return '0x' + address.lower()[2:].rjust(64, '0')
+
+
+def topic_address(topic):
+    return '0x' + topic[-40:]
+
+
+def is_too_many_results(error):
+    return error.code == -32005 or any(text in str(error).lower() for text in TOO_MANY_RESULTS)
+
+
+async def get_chain_head():
+    return int(await rpc_call('eth_blockNumber', []), 16)
+
+
+async def get_transfer_logs(contract_address, from_block, to_block, to_addresses):
+    return await rpc_call('eth_getLogs', [{
+        'address': contract_address,
+        'fromBlock': hex(from_block),
+        'toBlock': hex(to_block),
+        'topics': [TRANSFER_TOPIC, None, [address_topic(address) for address in to_addresses]],
+    }])
+
+
+async def get_block_timestamps(block_numbers):
+    missing = [number for number in set(block_numbers) if number not in _block_timestamps]
+    for i in range(0, len(missing), BLOCK_BATCH_SIZE):
+        batch = missing[i:i + BLOCK_BATCH_SIZE]
+        blocks = await rpc_batch([('eth_getBlockByNumber', [hex(number), False]) for number in batch])
+        for number, block in zip(batch, blocks):
+            _block_timestamps[number] = int(block['timestamp'], 16)
+    while len(_block_timestamps) > MAX_TIMESTAMP_CACHE:
+        _block_timestamps.popitem(last=False)
+    return {number: _block_timestamps[number] for number in block_numbers if number in _block_timestamps}
+
+
+async def logs_to_transfers(logs):
+    """Turn raw Transfer logs into rows shaped like Arbiscan `tokentx` results."""
+    if not logs:
+        return []
+    numbers = [int(log['blockNumber'], 16) for log in logs]
+    timestamps = await get_block_timestamps([n for n, log in zip(numbers, logs) if 'blockTimestamp' not in log])
+    transfers = []
+    for number, log in zip(numbers, logs):
+        timestamp = int(log['blockTimestamp'], 16) if 'blockTimestamp' in log else timestamps[number]
+        transfers.append({
+            'hash': log['transactionHash'],
+            'blockNumber': number,
+            'timeStamp': timestamp,
+            'logIndex': int(log['logIndex'], 16),
+            'from': topic_address(log['topics'][1]),
+            'to': topic_address(log['topics'][2]),
+            'value': str(int(log['data'], 16)),
+        })
+    return transfers
+
+
+async def fetch_burn_logs(contract_address, to_addresses, start_block, end_block, on_chunk, chunk_size=None):
+    """Walk `Transfer` logs into `to_addresses` from `start_block` to `end_block`.
+
+    Block chunks are requested `LOG_CHUNK_CONCURRENCY` at a time. When the
+    provider refuses a chunk for returning too many results the chunk size is
+    halved and the walk resumes at that chunk; after a fully successful round
+    it doubles again up to `LOG_MAX_CHUNK_SIZE`.
+
+    After every round `on_chunk(transfers, last_block)` is awaited with the
+    transfers of the contiguous successful prefix, so the caller can persist
+    them together with `last_block` as a resumable cursor. Returns the chunk
+    size reached, which makes a good starting point for the next run.
+    """
+    chunk_size = chunk_size or LOG_CHUNK_SIZE
+    block = start_block
+    while block <= end_block:
+        ranges = []
+        for _ in range(LOG_CHUNK_CONCURRENCY):
+            if block > end_block:
+                break
+            ranges.append((block, min(end_block, block + chunk_size - 1)))
+            block += chunk_size
+
+        results = await asyncio.gather(
+            *(get_transfer_logs(contract_address, s, e, to_addresses) for s, e in ranges),
+            return_exceptions=True
+        )
+
+        logs = []
+        last_block = None
+        shrunk = False
+        for (s, e), result in zip(ranges, results):
+            if isinstance(result, Exception):
+                if not isinstance(result, RPCError) or not is_too_many_results(result) or s == e:
+                    raise result
+                chunk_size = max(1, (e - s + 1) // 2)
+                block = s
+                shrunk = True
+                break
+            logs.extend(result)
+            last_block = e
+
+        if last_block is not None:
+            await on_chunk(await logs_to_transfers(logs), last_block)
+        if not shrunk:
+            chunk_size = min(chunk_size * 2, LOG_MAX_CHUNK_SIZE)
+
+    return chunk_size
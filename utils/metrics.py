@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from pymongo import monitoring
+
+from .cache import cache_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recording is a dict lookup and a bisect under an uncontended lock (Mongo
+# events arrive on driver threads), cheap enough to leave on permanently.
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, (list(counts), count, total)) for labels, (counts, count, total) in self._series.items()]
+        for labels, (counts, count, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+        return lines
+
+
+def collector(func):
+    """Register `func() -> [lines]`, called at scrape time for values kept elsewhere."""
+    _collectors.append(func)
+    return func
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for func in _collectors:
+        lines.extend(func())
+    return '\n'.join(lines) + '\n'
+
+
+upstream_latency = Histogram('upstream_request_duration_seconds', 'Latency of calls to upstream services.',
+                             ('upstream', 'operation'))
+upstream_requests = Counter('upstream_requests_total', 'Upstream calls by outcome; status is the HTTP status, '
+                            'ok/error for non-HTTP upstreams, or the exception name.',
+                            ('upstream', 'operation', 'status'))
+handler_latency = Histogram('handler_duration_seconds', 'Time spent in aiogram handlers.', ('handler',))
+handler_errors = Counter('handler_errors_total', 'Exceptions raised by aiogram handlers.', ('handler', 'error'))
+broadcast_messages = Counter('broadcast_messages_total', 'Broadcast deliveries by result.', ('result',))
+broadcast_send_latency = Histogram('broadcast_send_duration_seconds', 'Latency of single broadcast sends.')
+
+
+class UpstreamCall:
+    __slots__ = ('status',)
+
+    def __init__(self):
+        self.status = 'ok'
+
+
+@asynccontextmanager
+async def track_upstream(upstream, operation):
+    """Time one upstream call; set `.status` on the yielded object, e.g. to the HTTP status."""
+    call = UpstreamCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        # keep an error status such as 503, but a 200 that still failed counts as the exception
+        if call.status in ('ok', 200):
+            call.status = type(e).__name__
+        raise
+    finally:
+        upstream_latency.observe(time.perf_counter() - started, upstream, operation)
+        upstream_requests.inc(upstream, operation, str(call.status))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Pass to the Mongo client as an event listener to time every command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        upstream_latency.observe(event.duration_micros / 1e6, 'mongo', event.command_name)
+        upstream_requests.inc('mongo', event.command_name, 'ok')
+
+    def failed(self, event):
+        upstream_latency.observe(event.duration_micros / 1e6, 'mongo', event.command_name)
+        upstream_requests.inc('mongo', event.command_name, 'error')
+
+
+class HandlerMetricsMiddleware:
+    """aiogram inner middleware recording latency and errors per handler function."""
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, name)
+
+
+@collector
+def _cache_metrics():
+    lines = ["# HELP cache_requests_total Lookups of async_cached functions by result.",
+             "# TYPE cache_requests_total counter"]
+    ratios = ["# HELP cache_hit_ratio Share of lookups answered from the cache or an in-flight call.",
+              "# TYPE cache_hit_ratio gauge"]
+    for name, stats in list(cache_stats.items()):
+        for result in ('hits', 'misses', 'coalesced'):
+            lines.append(f"cache_requests_total{_labels(('cache', 'result'), (name, result))} {stats[result]}")
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        if lookups:
+            ratio = (stats['hits'] + stats['coalesced']) / lookups
+            ratios.append(f"cache_hit_ratio{_labels(('cache',), (name,))} {ratio}")
+    return lines + ratios
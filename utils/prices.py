@@ -0,0 +1,258 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from config import (CONTRACT_ADDRESS, PRICE_SOURCES, PRICE_CACHE_TTL, PRICE_HEDGE_DELAY, PRICE_TIMEOUT,
+                    DEXVIEW_API_URL, DEXVIEW_BATCH_SIZE, GECKOTERMINAL_API_URL, GECKOTERMINAL_NETWORK,
+                    DEXTOOLS_API_URL, DEXTOOLS_API_KEY)
+from .cache import async_cached
+from .http_client import get_session
+from .metrics import collector, track_upstream
+from .tokens import all_tokens
+
+LATENCY_WINDOW = 100
+MIN_SAMPLES = 5
+MIN_HEDGE_DELAY = 0.05
+
+
+class PriceSourceError(Exception):
+    pass
+
+
+class PriceQuote:
+    __slots__ = ('source', 'price_usd', 'liquidity_usd')
+
+    def __init__(self, source, price_usd, liquidity_usd=None):
+        self.source = source
+        self.price_usd = price_usd
+        self.liquidity_usd = liquidity_usd
+
+    def __repr__(self):
+        return f"PriceQuote(source={self.source!r}, price_usd={self.price_usd}, liquidity_usd={self.liquidity_usd})"
+
+
+class SourceStats:
+    """Recent upstream latencies and failures of one price source."""
+    __slots__ = ('latencies', 'successes', 'failures', 'consecutive_failures')
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def record(self, elapsed, ok):
+        if ok:
+            self.latencies.append(elapsed)
+            self.successes += 1
+            self.consecutive_failures = 0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def percentile(self, q):
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def hedge_delay(self):
+        p95 = self.percentile(0.95)
+        return PRICE_HEDGE_DELAY if p95 is None else max(MIN_HEDGE_DELAY, p95)
+
+    def rank(self):
+        p50 = self.percentile(0.5)
+        return self.consecutive_failures, PRICE_HEDGE_DELAY if p50 is None else p50
+
+
+_stats = {}
+
+
+def source_stats():
+    return {name: dict(p50=stats.percentile(0.5), p95=stats.percentile(0.95), successes=stats.successes,
+                       failures=stats.failures)
+            for name, stats in _stats.items()}
+
+
+@collector
+def _source_metrics():
+    """The latencies and outcomes `get_price` ranks sources by."""
+    latencies = ["# HELP price_source_latency_seconds Recent latency of each price source, as used for hedging.",
+                 "# TYPE price_source_latency_seconds gauge"]
+    calls = ["# HELP price_source_calls_total Uncached price source calls by result.",
+             "# TYPE price_source_calls_total counter"]
+    for name, stats in source_stats().items():
+        for key, quantile in (('p50', '0.5'), ('p95', '0.95')):
+            if stats[key] is not None:
+                latencies.append(f'price_source_latency_seconds{{source="{name}",quantile="{quantile}"}} {stats[key]}')
+        for key, result in (('successes', 'success'), ('failures', 'failure')):
+            calls.append(f'price_source_calls_total{{source="{name}",result="{result}"}} {stats[key]}')
+    return latencies + calls
+
+
+def _timed(name):
+    """Record the latency of real upstream calls, i.e. below the cache."""
+    stats = _stats.setdefault(name, SourceStats())
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                quote = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                stats.record(time.monotonic() - started, False)
+                raise
+            stats.record(time.monotonic() - started, quote is not None)
+            return quote
+        return wrapper
+    return decorator
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _get_json(source, url, headers=None):
+    host = urlparse(url).netloc
+    session = get_session()
+    async with track_upstream(source, 'price') as call:
+        async with session.get(url, headers=headers) as response:
+            call.status = response.status
+            if response.status != 200:
+                # raised rather than returned, so the cache does not keep the failure
+                raise PriceSourceError(f"Error fetching {host}, status code: {response.status}")
+            return await response.json(content_type=None)
+
+
+async def _dexview_chunk(token_addresses):
+    data = await _get_json('dexview', f"{DEXVIEW_API_URL}/latest/dex/tokens/{','.join(token_addresses)}",
+                           headers={"Accept": "application/json"})
+    quotes = {}
+    for pair in (data or {}).get('pairs') or []:
+        address = ((pair.get('baseToken') or {}).get('address') or '').lower()
+        price = _to_float(pair.get('priceUsd'))
+        # the first pair listed for a token is the one reported, as before
+        if address in token_addresses and address not in quotes and price is not None:
+            quotes[address] = PriceQuote('dexview', price, _to_float((pair.get('liquidity') or {}).get('usd')))
+    return quotes
+
+
+@async_cached(ttl=PRICE_CACHE_TTL)
+@_timed('dexview')
+async def dexview_quotes(token_addresses):
+    """Quotes for a tuple of lowercase addresses, `DEXVIEW_BATCH_SIZE` per request."""
+    chunks = [token_addresses[i:i + DEXVIEW_BATCH_SIZE] for i in range(0, len(token_addresses), DEXVIEW_BATCH_SIZE)]
+    quotes = {}
+    for chunk_quotes in await asyncio.gather(*(_dexview_chunk(chunk) for chunk in chunks)):
+        quotes.update(chunk_quotes)
+    return quotes or None
+
+
+async def dexview_quote(token_address):
+    # Ask for every tracked token at once, so concurrent lookups share one request.
+    addresses = {token.key for token in all_tokens()}
+    addresses.add(token_address.lower())
+    quotes = await dexview_quotes(tuple(sorted(addresses)))
+    return (quotes or {}).get(token_address.lower())
+
+
+@async_cached(ttl=PRICE_CACHE_TTL)
+@_timed('geckoterminal')
+async def geckoterminal_quote(token_address):
+    url = f"{GECKOTERMINAL_API_URL}/api/v2/networks/{GECKOTERMINAL_NETWORK}/tokens/{token_address.lower()}"
+    data = await _get_json('geckoterminal', url, headers={"Accept": "application/json"})
+    attributes = ((data or {}).get('data') or {}).get('attributes') or {}
+    price = _to_float(attributes.get('price_usd'))
+    if price is None:
+        return None
+    return PriceQuote('geckoterminal', price, _to_float(attributes.get('total_reserve_in_usd')))
+
+
+@async_cached(ttl=PRICE_CACHE_TTL)
+@_timed('dextools')
+async def dextools_quote(token_address):
+    data = await _get_json('dextools', f"{DEXTOOLS_API_URL}/price/{token_address.lower()}", headers={
+        "X-RapidAPI-Key": DEXTOOLS_API_KEY,
+        "X-RapidAPI-Host": urlparse(DEXTOOLS_API_URL).netloc,
+    })
+    if not isinstance(data, dict):
+        return None
+    data = data.get('data', data)
+    price = _to_float(data.get('price', data.get('priceUsd')))
+    if price is None:
+        return None
+    return PriceQuote('dextools', price, _to_float(data.get('liquidity')))
+
+
+SOURCES = {
+    'dexview': dexview_quote,
+    'geckoterminal': geckoterminal_quote,
+    'dextools': dextools_quote,
+}
+
+
+def _enabled_sources():
+    names = [name for name in PRICE_SOURCES if name in SOURCES]
+    if not DEXTOOLS_API_KEY and 'dextools' in names:
+        names.remove('dextools')
+    # Stable sort, so the configured order breaks ties until enough samples exist.
+    return sorted(names, key=lambda name: _stats[name].rank())
+
+
+async def get_price(token_address=CONTRACT_ADDRESS, timeout=PRICE_TIMEOUT):
+    """Price and liquidity of a token from whichever source answers first.
+
+    Sources are tried fastest first. When the current one has not answered
+    within its own p95 latency, or fails, the next one is started alongside
+    it; the first valid quote wins. Returns None when no source answers
+    within `timeout`.
+    """
+    queue = _enabled_sources()
+    pending = set()
+    deadline = time.monotonic() + timeout
+    try:
+        while queue or pending:
+            if queue:
+                name = queue.pop(0)
+                pending.add(asyncio.ensure_future(SOURCES[name](token_address)))
+                hedge_at = time.monotonic() + _stats[name].hedge_delay()
+            while pending:
+                now = time.monotonic()
+                wait_until = min(deadline, hedge_at) if queue else deadline
+                if wait_until <= now:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=wait_until - now,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # hedge delay or deadline reached
+                    break
+                for task in done:
+                    if task.exception() is not None:
+                        logging.warning(f"Price source failed for {token_address}: {task.exception()!r}")
+                    elif task.result() is not None:
+                        return task.result()
+                if queue:
+                    # a source failed, so hedge right away instead of waiting
+                    break
+            if time.monotonic() >= deadline:
+                break
+        return None
+    finally:
+        # The cached calls are shielded, so cancelling here still lets them fill the cache.
+        for task in pending:
+            task.cancel()
+
+
+async def get_prices(token_addresses):
+    """`{address.lower(): PriceQuote or None}` for several tokens; DexView answers them in one request."""
+    quotes = await asyncio.gather(*(get_price(address) for address in token_addresses))
+    return {address.lower(): quote for address, quote in zip(token_addresses, quotes)}
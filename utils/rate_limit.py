@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+
+# Which caller a `FairTokenBucket.acquire()` is made on behalf of, e.g. a token address.
+rate_key = contextvars.ContextVar('rate_key', default=None)
+
+
+class TokenBucket:
+    """Async token bucket shared by every caller of one upstream quota.
+
+    `rate` tokens are added per second up to `capacity`; each `acquire()`
+    takes one token and waits when the bucket is empty.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self, seconds):
+        """Drain the bucket so nobody gets a token for roughly `seconds`."""
+        self._refill(time.monotonic())
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class FairTokenBucket(TokenBucket):
+    """Token bucket that hands tokens out round-robin across `rate_key` values.
+
+    A caller with a long backlog (say, a ledger backfill) then only gets its
+    share of the quota while other keys are waiting, instead of holding the
+    whole queue.
+    """
+
+    def __init__(self, rate, capacity=None):
+        super().__init__(rate, capacity)
+        self._waiters = OrderedDict()
+        self._dispatcher = None
+
+    async def acquire(self):
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(rate_key.get(), deque()).append(waiter)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await waiter
+
+    def _next_waiter(self):
+        while self._waiters:
+            key, waiters = next(iter(self._waiters.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not waiter.done():
+                return waiter
+        return None
+
+    async def _dispatch(self):
+        while self._waiters:
+            await super().acquire()
+            waiter = self._next_waiter()
+            if waiter is None:
+                # every remaining waiter gave up; hand the token back
+                self._tokens += 1
+                return
+            waiter.set_result(None)
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import aiohttp
+
+from config import RECENT_BURNS_SIZE, RECENT_BURNS_TTL, RECENT_BURNS_PAGE_SIZE, api_key
+from .arbiscan import MAX_RESULTS_PER_PAGE, ArbiscanError, iter_newest
+from .decode import decode_transfers
+from .ledger import BURN_ADDRESSES
+
+
+class RecentBurns:
+    """The newest burn transfers of one contract, newest first, in a ring buffer.
+
+    The first update pages through `txlist` newest first, doubling the page
+    size each time, and stops once `size` burns have been decoded. Later
+    updates only scan blocks after the newest one already seen and push what
+    they find onto the front, which drops the oldest entries. `latest()` is
+    a slice of the buffer; updates run in a background task, so callers only
+    wait for the first one.
+    """
+
+    def __init__(self, contract_address, size=RECENT_BURNS_SIZE, max_age=RECENT_BURNS_TTL,
+                 page_size=RECENT_BURNS_PAGE_SIZE, recipients=BURN_ADDRESSES):
+        self.contract_address = contract_address.lower()
+        self.size = size
+        self.max_age = max_age
+        self.page_size = page_size
+        self.recipients = recipients
+        # (recipient, amount, timestamp, sender, hash) rows, newest first
+        self.rows = deque(maxlen=size)
+        self.last_block = None
+        self.updated_at = 0.0
+        self._update_task = None
+
+    def _decode(self, page):
+        # failed calls still show up in txlist with their calldata
+        succeeded = [tx for tx in page if tx.get('isError') != '1']
+        return list(decode_transfers(succeeded, self.recipients).rows())
+
+    async def update(self, api_key=api_key):
+        found = []
+        newest_block = None
+        start_block = None if self.last_block is None else self.last_block + 1
+        params = {'module': 'account', 'action': 'txlist', 'address': self.contract_address}
+        async for page in iter_newest(params, start_block, page_size=self.page_size, api_key=api_key,
+                                      max_page_size=MAX_RESULTS_PER_PAGE):
+            if newest_block is None:
+                newest_block = int(page[0]['blockNumber'])
+            found.extend(self._decode(page))
+            if len(found) >= self.size:
+                break
+        # keep newest first: the first of `found` has to end up leftmost
+        self.rows.extendleft(reversed(found))
+        if newest_block is not None:
+            self.last_block = newest_block
+        self.updated_at = time.monotonic()
+
+    async def _update_logged(self, api_key):
+        try:
+            await self.update(api_key)
+        except (ArbiscanError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Failed to fetch recent burns of {self.contract_address}: {e}")
+
+    async def latest(self, last_n=None, api_key=api_key):
+        """Up to `last_n` newest burns.
+
+        Once older than `max_age` the buffer is refreshed by one shared
+        background task and served as it is meanwhile; only a buffer that was
+        never filled is waited for.
+        """
+        if time.monotonic() - self.updated_at > self.max_age:
+            if self._update_task is None or self._update_task.done():
+                self._update_task = asyncio.ensure_future(self._update_logged(api_key))
+            if not self.updated_at:
+                await asyncio.shield(self._update_task)
+        rows = list(self.rows)
+        return rows if last_n is None else rows[:last_n]
+
+
+_buffers = {}
+
+
+def recent_burns(contract_address):
+    key = contract_address.lower()
+    if key not in _buffers:
+        _buffers[key] = RecentBurns(key)
+    return _buffers[key]
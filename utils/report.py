@@ -0,0 +1,108 @@
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from contextlib import asynccontextmanager
+
+from aiogram.types import BufferedInputFile, InputFile
+
+from config import REPORT_SPOOL_SIZE
+from .utils import format_large_number, timestamp_to_datetime
+
+REPORT_FORMATS = ('txt', 'csv', 'jsonl')
+ROWS_PER_WRITE = 500
+CSV_HEADER = ('hash', 'from', 'to', 'amount', 'amount_raw', 'date')
+
+
+class SpooledInputFile(InputFile):
+    """Uploads a report that spilled from memory to a temporary file, one chunk at a time."""
+
+    def __init__(self, file, filename, chunk_size=64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        await asyncio.to_thread(self.file.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _txt_rows(transfers, decimals):
+    for recipient, amount, timestamp, sender, tx_hash in transfers.rows():
+        yield (
+            f"Transaction Hash: {tx_hash}\n"
+            f"From: {sender}\n"
+            f"To: {recipient}\n"
+            f"Amount: {format_large_number(amount / 10 ** decimals)} Tokens\n"
+            f"Date: {timestamp_to_datetime(timestamp)}\n"
+            "\n"
+        )
+
+
+def _csv_rows(transfers, decimals):
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(CSV_HEADER)
+    for recipient, amount, timestamp, sender, tx_hash in transfers.rows():
+        writer.writerow((tx_hash, sender, recipient, amount / 10 ** decimals, amount,
+                         timestamp_to_datetime(timestamp).isoformat()))
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    yield line.getvalue()
+
+
+def _jsonl_rows(transfers, decimals):
+    for recipient, amount, timestamp, sender, tx_hash in transfers.rows():
+        yield json.dumps({
+            'hash': tx_hash,
+            'from': sender,
+            'to': recipient,
+            'amount': amount / 10 ** decimals,
+            'amount_raw': str(amount),
+            'timestamp': timestamp,
+        }) + "\n"
+
+
+_WRITERS = {'txt': _txt_rows, 'csv': _csv_rows, 'jsonl': _jsonl_rows}
+
+
+def write_report(transfers, file, fmt='txt', decimals=18):
+    """Write `TransferColumns` to a binary file in batches of formatted rows."""
+    batch = []
+    for row in _WRITERS[fmt](transfers, decimals):
+        batch.append(row)
+        if len(batch) >= ROWS_PER_WRITE:
+            file.write(''.join(batch).encode())
+            batch.clear()
+    if batch:
+        file.write(''.join(batch).encode())
+
+
+@asynccontextmanager
+async def export_report(transfers, fmt='txt', name='transaction_report', decimals=18):
+    """Build a burn report for one request and yield it as an aiogram input file.
+
+    Rows are formatted off the event loop into a per-request spooled buffer:
+    small reports stay in memory and go out as a `BufferedInputFile`, larger
+    ones roll over to a private temp file that is streamed on upload. The
+    buffer is dropped when the context exits.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown report format: {fmt}")
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_SIZE, mode='w+b')
+    try:
+        await asyncio.to_thread(write_report, transfers, buffer, fmt, decimals)
+        filename = f"{name}.{fmt}"
+        if buffer.tell() <= REPORT_SPOOL_SIZE:
+            buffer.seek(0)
+            yield BufferedInputFile(buffer.read(), filename=filename)
+        else:
+            yield SpooledInputFile(buffer, filename)
+    finally:
+        buffer.close()
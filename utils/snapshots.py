@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from config import (BURN_SOURCE, SNAPSHOT_COLLECTION, SNAPSHOT_REFRESH_INTERVAL,
+                    SNAPSHOT_STALE_AFTER, SNAPSHOT_READ_TTL)
+from .asyncUtils import (get_supply_and_burned, cross_check_burned, get_burnt_tokens_weekly,
+                         fetch_onchain_burn_states)
+from .burn_index import get_burn_index
+from .chain import get_contract
+from .db import get_collection
+from .prices import get_prices
+from .tokens import all_tokens
+from .utils import datetime_to_timestamp
+
+CHART_DAYS = 7
+
+
+class Snapshot:
+    """Precomputed data shared by every replica through Mongo.
+
+    `compute()` runs on a schedule and its result is stored under `name`
+    with an increasing `version` and the time it was computed. Readers get
+    the latest stored document from memory or Mongo without calling
+    `compute()`; one older than `stale_after` triggers a background refresh
+    and is still served meanwhile. Only when nothing has been stored yet
+    does a reader wait for the first computation.
+    """
+
+    def __init__(self, name, compute, refresh_interval=SNAPSHOT_REFRESH_INTERVAL, stale_after=SNAPSHOT_STALE_AFTER,
+                 read_ttl=SNAPSHOT_READ_TTL):
+        self.name = name
+        self.compute = compute
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.read_ttl = read_ttl
+        self._latest = None
+        self._read_at = 0.0
+        self._refresh_task = None
+        self._schedule_task = None
+        self._scheduled = None
+
+    @property
+    def collection(self):
+        return get_collection(SNAPSHOT_COLLECTION)
+
+    def _age(self, snapshot):
+        return time.time() - snapshot['computed_at']
+
+    async def _read(self):
+        if self._latest is None or time.monotonic() - self._read_at > self.read_ttl:
+            try:
+                stored = await self.collection.find_one({'_id': self.name})
+            except PyMongoError as e:
+                logging.error(f"Could not read snapshot {self.name}: {e}")
+                stored = None
+            if stored is not None and (self._latest is None or stored['version'] >= self._latest['version']):
+                self._latest = stored
+            self._read_at = time.monotonic()
+        return self._latest
+
+    async def get(self):
+        snapshot = await self._read()
+        if snapshot is None:
+            return await asyncio.shield(self.refresh_soon())
+        if self._age(snapshot) > self.stale_after:
+            self.refresh_soon()
+        return snapshot
+
+    def refresh_soon(self):
+        """Start a background refresh unless one is already running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.refresh())
+        return self._refresh_task
+
+    async def refresh(self, force=False):
+        """Recompute and store a new version.
+
+        Skipped when another replica stored one less than `refresh_interval`
+        ago, unless `force` is set. Returns the latest snapshot either way.
+        """
+        if self._refresh_task is not None and not self._refresh_task.done() \
+                and self._refresh_task is not asyncio.current_task():
+            return await asyncio.shield(self._refresh_task)
+
+        self._read_at = 0.0
+        current = await self._read()
+        if not force and current is not None and self._age(current) < self.refresh_interval:
+            return current
+
+        started = time.monotonic()
+        try:
+            data = await self.compute()
+        except Exception as e:
+            logging.error(f"Failed to compute snapshot {self.name}: {e}")
+            return current
+
+        version = current['version'] if current is not None else 0
+        try:
+            stored = await self.collection.find_one_and_update(
+                {'_id': self.name, 'version': version} if current is not None else {'_id': self.name},
+                {'$set': {'data': data, 'computed_at': time.time(), 'compute_seconds': time.monotonic() - started},
+                 '$inc': {'version': 1}},
+                upsert=current is None,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # another replica created it first
+            stored = None
+        except PyMongoError as e:
+            logging.error(f"Could not store snapshot {self.name}: {e}")
+            return current or {'_id': self.name, 'version': 0, 'computed_at': time.time(), 'data': data}
+
+        if stored is None:
+            # lost the race to a newer version; serve that one
+            self._read_at = 0.0
+            return await self._read()
+        self._latest = stored
+        self._read_at = time.monotonic()
+        return stored
+
+    async def _refresh_periodically(self):
+        while True:
+            try:
+                if self._scheduled is None or self._scheduled():
+                    await self.refresh_soon()
+            except Exception:
+                logging.exception(f"Scheduled refresh of snapshot {self.name} failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, scheduled=None):
+        """Refresh every `refresh_interval`; `scheduled()` may veto a round, e.g. on non-leaders."""
+        self._scheduled = scheduled
+        if self._schedule_task is None:
+            self._schedule_task = asyncio.ensure_future(self._refresh_periodically())
+
+    def stop(self):
+        if self._schedule_task is not None:
+            self._schedule_task.cancel()
+            self._schedule_task = None
+        self._scheduled = None
+
+
+async def compute_week_statistics(tokens=None):
+    """Weekly report data of every tracked token, keyed by lowercase address."""
+    tokens = tokens or all_tokens()
+    end_date = datetime.utcnow().replace(second=0, microsecond=0)
+    start_date = end_date - timedelta(days=7)
+    contracts = [get_contract(token.address) for token in tokens]
+
+    if BURN_SOURCE == 'onchain':
+        supply_task = fetch_onchain_burn_states(contracts)
+    else:
+        supply_task = asyncio.gather(*(get_supply_and_burned(contract) for contract in contracts))
+    supplies, burned_weeks, quotes = await asyncio.gather(
+        supply_task,
+        asyncio.gather(*(get_burnt_tokens_weekly(token.address) for token in tokens)),
+        get_prices([token.address for token in tokens])
+    )
+    if BURN_SOURCE == 'onchain':
+        supplies = [supplies[token.key] for token in tokens]
+    # the ledger was just synced above, so the indexes only need to catch up with it
+    indexes = await asyncio.gather(*(get_burn_index(token.address) for token in tokens))
+    await asyncio.gather(*(index.refresh(sync=False) for index in indexes))
+    end = datetime_to_timestamp(end_date)
+    day_ends = [end - 86400 * day for day in range(CHART_DAYS - 1, -1, -1)]
+
+    stats = {}
+    for token, (total_supply, burned_amount), burned_week, index in zip(tokens, supplies, burned_weeks, indexes):
+        quote = quotes[token.key]
+        stats[token.key] = {
+            'start': datetime_to_timestamp(start_date),
+            'end': datetime_to_timestamp(end_date),
+            'total_supply': total_supply,
+            'burned': burned_amount,
+            'burned_week': burned_week,
+            'current_supply': total_supply - burned_amount,
+            'burned_percent': (burned_amount / total_supply) * 100 if total_supply > 0 else 0,
+            'price_usd': quote.price_usd if quote else None,
+            'liquidity_usd': quote.liquidity_usd if quote else None,
+            'price_source': quote.source if quote else None,
+            'daily_burned': {
+                'days': [day_end - 86400 for day_end in day_ends],
+                'burned': [index.total(day_end - 86400, day_end - 1) / token.unit for day_end in day_ends],
+            },
+        }
+    return {'tokens': stats}
+
+
+async def cross_check_all_burned(tokens=None):
+    """`cross_check_burned` for every tracked token.
+
+    It syncs the ledger in full, so it runs on its own, slower schedule
+    rather than with every snapshot.
+    """
+    tokens = tokens or all_tokens()
+    results = await asyncio.gather(*(cross_check_burned(get_contract(token.address)) for token in tokens),
+                                   return_exceptions=True)
+    for token, result in zip(tokens, results):
+        if isinstance(result, Exception):
+            logging.warning(f"Could not cross-check burned supply of {token.symbol}: {result}")
+
+
+week_statistics_snapshot = Snapshot('week_statistics_by_token', compute_week_statistics)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from config import SUBSCRIBER_FLUSH_INTERVAL, SUBSCRIBER_FLUSH_BATCH, CHAT_COLLECTION
+from .db import get_collection
+
+LOAD_BATCH_SIZE = 5000
+ITER_CHUNK_SIZE = 1000
+
+
+class SubscriberRegistry:
+    """In-memory set of subscribed chat ids backed by a Mongo collection.
+
+    Chat ids are loaded once with a projection; subscribe and unsubscribe
+    only touch the set and queue a write, and queued writes go to Mongo in
+    one `bulk_write` every `flush_interval` seconds or once `flush_batch`
+    of them pile up.
+    """
+
+    def __init__(self, collection, flush_interval=SUBSCRIBER_FLUSH_INTERVAL, flush_batch=SUBSCRIBER_FLUSH_BATCH):
+        # a collection name is resolved on first use so importing stays free of I/O
+        self._collection = collection
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._chat_ids = set()
+        # chat_id -> True to upsert, False to delete; the last change wins
+        self._pending = {}
+        self._loaded = False
+        self._load_lock = None
+        self._flush_lock = None
+        self._flush_task = None
+
+    @property
+    def collection(self):
+        if isinstance(self._collection, str):
+            self._collection = get_collection(self._collection)
+        return self._collection
+
+    def __contains__(self, chat_id):
+        return chat_id in self._chat_ids
+
+    def __len__(self):
+        return len(self._chat_ids)
+
+    async def start(self):
+        try:
+            await self.collection.create_index('chat_id', unique=True)
+        except PyMongoError as e:
+            logging.error(f"Could not ensure unique chat_id index: {e}")
+        await self.load()
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    async def load(self):
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._loaded:
+                return
+            cursor = self.collection.find({}, {'chat_id': 1, '_id': 0}, batch_size=LOAD_BATCH_SIZE)
+            async for doc in cursor:
+                self._chat_ids.add(doc['chat_id'])
+            self._loaded = True
+
+    async def reload(self):
+        """Re-read the collection to pick up changes made by other replicas."""
+        await self.flush()
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            chat_ids = set()
+            cursor = self.collection.find({}, {'chat_id': 1, '_id': 0}, batch_size=LOAD_BATCH_SIZE)
+            async for doc in cursor:
+                chat_ids.add(doc['chat_id'])
+            # changes queued while reading are newer than what was read
+            for chat_id, subscribed in self._pending.items():
+                if subscribed:
+                    chat_ids.add(chat_id)
+                else:
+                    chat_ids.discard(chat_id)
+            self._chat_ids = chat_ids
+            self._loaded = True
+
+    async def add(self, chat_id):
+        await self.load()
+        self._chat_ids.add(chat_id)
+        self._pending[chat_id] = True
+        await self._flush_if_full()
+
+    async def remove(self, chat_id):
+        await self.discard_many([chat_id])
+
+    async def discard_many(self, chat_ids):
+        await self.load()
+        for chat_id in chat_ids:
+            self._chat_ids.discard(chat_id)
+            self._pending[chat_id] = False
+        await self._flush_if_full()
+
+    async def _flush_if_full(self):
+        if len(self._pending) >= self.flush_batch:
+            await self.flush()
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            operations = [
+                UpdateOne({'chat_id': chat_id}, {'$setOnInsert': {'chat_id': chat_id}}, upsert=True)
+                if subscribed else DeleteOne({'chat_id': chat_id})
+                for chat_id, subscribed in pending.items()
+            ]
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+            except PyMongoError as e:
+                logging.error(f"Failed to flush {len(operations)} subscriber changes: {e}")
+                # Put them back unless a newer change arrived meanwhile.
+                for chat_id, subscribed in pending.items():
+                    self._pending.setdefault(chat_id, subscribed)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def all(self):
+        await self.load()
+        return list(self._chat_ids)
+
+    async def __aiter__(self):
+        """Stream chat ids in chunks, yielding to the event loop between chunks."""
+        await self.load()
+        chat_ids = list(self._chat_ids)
+        for i in range(0, len(chat_ids), ITER_CHUNK_SIZE):
+            for chat_id in chat_ids[i:i + ITER_CHUNK_SIZE]:
+                yield chat_id
+            await asyncio.sleep(0)
+
+
+subscribers = SubscriberRegistry(CHAT_COLLECTION)
@@ -1,6 +1,6 @@
 import asyncio
 import aiohttp
-from config import CONTRACT_ABI, ARBITRUM_RPC_URL as RPC_URL, CONTRACT_ADDRESS, api_key as API_KEY
+from config import ARBITRUM_RPC_URL as RPC_URL, CONTRACT_ADDRESS, api_key as API_KEY
 from datetime import datetime
 
 
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+
+from config import CONTRACT_ADDRESS, TOKEN_SYMBOL, TOKENS_FILE
+
+_tokens = None
+
+
+class Token:
+    """One tracked ERC-20 token and the links shown next to its statistics."""
+    __slots__ = ('address', 'symbol', 'decimals', 'chart_url', 'trade_url', 'explorer_url')
+
+    def __init__(self, address, symbol, decimals=18, chart_url=None, trade_url=None, explorer_url=None):
+        self.address = to_checksum_address(address)
+        self.symbol = symbol
+        self.decimals = int(decimals)
+        self.chart_url = chart_url or f"https://www.dextools.io/app/en/arbitrum/pair-explorer/{self.key}"
+        self.trade_url = trade_url or f"https://www.sushi.com/swap?outputCurrency={self.key}"
+        self.explorer_url = explorer_url or f"https://arbiscan.io/address/{self.key}"
+
+    @property
+    def key(self):
+        return self.address.lower()
+
+    @property
+    def unit(self):
+        return 10 ** self.decimals
+
+    def __repr__(self):
+        return f"Token({self.symbol!r}, {self.address!r})"
+
+
+def _default_tokens():
+    return [Token(CONTRACT_ADDRESS, TOKEN_SYMBOL,
+                  chart_url="https://www.dextools.io/app/en/arbitrum/pair-explorer/"
+                            "0xbee32bffb0cd21278acd8b00786b6e840e7a7108")]
+
+
+def load_tokens(path=TOKENS_FILE):
+    """Read the token list, e.g. `[{"address": "0x...", "symbol": "S", "decimals": 18}]`.
+
+    `chart_url`, `trade_url` and `explorer_url` are optional. The first
+    entry is the default token for commands given no symbol.
+    """
+    path = Path(path)
+    if not path.exists():
+        return _default_tokens()
+    with open(path, 'r') as tokens_file:
+        entries = json.load(tokens_file)
+    return [Token(**entry) for entry in entries] or _default_tokens()
+
+
+def all_tokens():
+    global _tokens
+    if _tokens is None:
+        _tokens = load_tokens()
+    return _tokens
+
+
+def default_token():
+    return all_tokens()[0]
+
+
+def find_token(query=None):
+    """Token by symbol or address, the default one for an empty query, else None."""
+    if not query:
+        return default_token()
+    query = query.strip().lower()
+    for token in all_tokens():
+        if query in (token.key, token.symbol.lower()):
+            return token
+    return None
+
+
+def get_token(address):
+    """Registered token for `address`, or an ad-hoc 18-decimal entry."""
+    return find_token(address) or Token(address, address[:8])
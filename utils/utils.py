@@ -1,10 +1,8 @@
 import requests
-from web3 import Web3
-import asyncio
-import aiohttp
-from config import CONTRACT_ABI, ARBITRUM_RPC_URL as RPC_URL, CONTRACT_ADDRESS, api_key as API_KEY
+import calendar
+from config import get_contract_abi, api_key as API_KEY
 from datetime import datetime
-from aiogram.enums import ParseMode
+from .recent_burns import recent_burns
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram import types
 from datetime import datetime
@@ -68,8 +66,9 @@ def get_current_supply(contract_address, api_key, initial_supply, decimals=18):
 
 
 def get_current_supply_from_contract(contract_address):
+    from web3 import Web3
     w3 = Web3(Web3.HTTPProvider('https://arb1.arbitrum.io/rpc'))  # Adjust the provider URL
-    contract = w3.eth.contract(address=contract_address, abi=CONTRACT_ABI)
+    contract = w3.eth.contract(address=contract_address, abi=get_contract_abi())
     current_supply = contract.functions.totalSupply().call()
     return current_supply / (10 ** 18)  # Adjust for decimals if necessary
 
@@ -92,6 +91,11 @@ def timestamp_to_datetime(unix_timestamp):
     return datetime.utcfromtimestamp(int(unix_timestamp))
 
 
+def datetime_to_timestamp(date):
+    """Convert a naive UTC datetime to a Unix timestamp."""
+    return calendar.timegm(date.utctimetuple())
+
+
 async def button_builder(text_list: list, callback: list, ) -> InlineKeyboardBuilder:
     builder = InlineKeyboardBuilder()
     for text in range(len(text_list)):
@@ -102,20 +106,13 @@ async def button_builder(text_list: list, callback: list, ) -> InlineKeyboardBui
     return builder
 
 
-async def fetch_transactions_by_quantity(from_address, to_address, api_key, last_n=None):
-    url = f"https://api.arbiscan.io/api?module=account&action=txlist&address={from_address}&startblock=0&endblock=99999999&sort=desc&apikey={api_key}"  # 'sort=desc' to get the latest transactions first
+async def fetch_transactions_by_quantity(from_address, api_key=API_KEY, last_n=None):
+    """The newest burns of `from_address` as (recipient, amount, timestamp, sender, hash) rows.
 
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False, limit=1)) as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                transactions = data.get('result', [])
-                relevant_transactions = [tx for tx in transactions if to_address in tx['input']]
-
-                # Return only the last 'last_n' transactions if specified, otherwise return all
-                return relevant_transactions[:last_n] if last_n is not None else relevant_transactions
-            else:
-                return f"Failed to fetch transactions, status code: {response.status}"
+    Served from the contract's `RecentBurns` buffer, so at most
+    `RECENT_BURNS_SIZE` rows come back.
+    """
+    return await recent_burns(from_address).latest(last_n, api_key)
 
 
 def format_large_number(number):
@@ -147,7 +144,6 @@ def format_price(value):
     return formatted_value
 
 
-print(get_burnt_tokens(contract_address=CONTRACT_ADDRESS, api_key=API_KEY))
 
 # Usage example
 # network = 'arbitrum'  # Specify the correct network
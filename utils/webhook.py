@@ -0,0 +1,77 @@
+import asyncio
+import hmac
+import logging
+
+from aiogram.types import Update
+
+from config import (WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_CONCURRENCY, WEBHOOK_MAX_PENDING,
+                    WEBHOOK_KEEP_ON_SHUTDOWN)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+DRAIN_TIMEOUT = 10
+
+
+class UpdateFeeder:
+    """Hands webhook updates to the dispatcher without making Telegram wait.
+
+    Each accepted update runs as its own task and at most `concurrency` of
+    them execute handlers at once. When `max_pending` updates are already
+    queued or running, `submit()` refuses the update so the endpoint can
+    answer with an error and Telegram redelivers it later.
+    """
+
+    def __init__(self, dispatcher, bot, secret=WEBHOOK_SECRET, concurrency=WEBHOOK_CONCURRENCY,
+                 max_pending=WEBHOOK_MAX_PENDING):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret = secret
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._semaphore = None
+        self._tasks = set()
+
+    def authorized(self, token):
+        return token is not None and self.secret is not None and \
+            hmac.compare_digest(token.encode(), self.secret.encode())
+
+    def submit(self, data):
+        """Schedule one update; returns False when it was refused for being over capacity."""
+        if len(self._tasks) >= self.max_pending:
+            return False
+        update = Update.model_validate(data, context={'bot': self.bot})
+        task = asyncio.ensure_future(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _process(self, update):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception:
+                logging.exception(f"Failed to process update {update.update_id}")
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    async def start(self, url=WEBHOOK_URL):
+        # a per-process secret would lock out every other replica behind the same URL
+        if not self.secret:
+            raise RuntimeError("WEBHOOK_SECRET must be set when WEBHOOK_URL is")
+        await self.bot.set_webhook(
+            url.rstrip('/') + WEBHOOK_PATH,
+            secret_token=self.secret,
+            allowed_updates=self.dispatcher.resolve_used_update_types(),
+            max_connections=min(100, self.concurrency),
+        )
+        logging.info(f"Webhook registered at {url.rstrip('/')}{WEBHOOK_PATH}")
+
+    async def stop(self):
+        if not WEBHOOK_KEEP_ON_SHUTDOWN:
+            await self.bot.delete_webhook()
+        if self._tasks:
+            # let handlers that already started answer their users
+            await asyncio.wait(set(self._tasks), timeout=DRAIN_TIMEOUT)